@@ -6,13 +6,14 @@ bison.bison
 This module implements the `bison` API.
 """
 
+import copy
+import functools
 import logging
 import os
-
-import yaml
+import re
 
 from bison.errors import BisonError
-from bison.utils import DotDict
+from bison.utils import DotDict, _split_key
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -21,6 +22,83 @@ logger.setLevel(logging.INFO)
 # enumerate the supported configuration formats
 YAML, = range(1)
 
+# index each configuration layer into the `Bison` layer versions
+_DEFAULT, _CONFIG, _ENVIRONMENT, _OVERRIDE = range(4)
+
+# matches the start of a top-level (non-indented, non-comment) line in
+# a YAML document. document markers (`---`, `...`) and directives (`%YAML`)
+# are not entries, so they are not matched.
+_top_level_line = re.compile(br'^(?!---|\.\.\.|%)[^\s#]', re.MULTILINE)
+
+# sentinels used when looking up a key in a single configuration layer:
+# `_missing` for a key which is not in the layer, and `_shadowed` for a
+# key whose path is interrupted by a non-dictionary value in the layer.
+_missing = object()
+_shadowed = object()
+
+# the yaml module and its load function. these are imported lazily, when
+# a YAML config is first parsed, so that importing `bison` does not pay
+# the cost of importing yaml.
+_yaml = None
+_yaml_load = None
+
+
+def _get_yaml_parser():
+    """Get the function used to load YAML configuration data.
+
+    The yaml module is imported on the first call and the load function is
+    memoized. YAML is loaded with the libyaml backed safe loader when it is
+    available.
+
+    Returns:
+        The function which loads YAML data from a string or file.
+
+    Raises:
+        BisonError: The yaml module is not installed.
+    """
+    global _yaml, _yaml_load
+
+    if _yaml_load is None:
+        try:
+            import yaml
+        except ImportError as e:
+            raise BisonError('PyYAML is required to parse YAML config files') from e
+
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        _yaml = yaml
+        _yaml_load = functools.partial(yaml.load, Loader=loader)
+    return _yaml_load
+
+
+@functools.lru_cache(maxsize=32)
+def _load_config_file(parser, path, stat_key):
+    """Load a configuration file with the given parser.
+
+    The results are cached on the file's inode, modification and change
+    times, and size along with its path, so re-parsing an unchanged file does
+    not run the parser again. A file which is modified or replaced gets a new
+    cache key. Failed loads are not cached.
+
+    A file rewritten in place to the same size within a single tick of the
+    filesystem timestamps keeps its cache key, so the stale result would be
+    returned for it.
+
+    The cached result is shared, so it should not be modified by the caller.
+
+    Args:
+        parser: The function which loads the configuration data from file.
+        path (str): The path to the configuration file.
+        stat_key (tuple): The (inode, mtime_ns, ctime_ns, size) of the file,
+            as used for the cache key.
+
+    Returns:
+        The parsed configuration data.
+    """
+    # the file is read as bytes so that the parser can do its own decoding
+    # rather than going through the text layer.
+    with open(path, 'rb') as f:
+        return parser(f)
+
 
 class Bison(object):
     """The configuration management object.
@@ -47,10 +125,10 @@ class Bison(object):
         YAML: ('.yml', '.yaml')
     }
 
-    # map the configuration format to the function is uses to load
-    # the configuration data from file.
+    # map the configuration format to the function which gets the function
+    # it uses to load the configuration data from file.
     _fmt_to_parser = {
-        YAML: yaml.safe_load
+        YAML: _get_yaml_parser
     }
 
     def __init__(self, scheme=None, enable_logging=False):
@@ -66,14 +144,39 @@ class Bison(object):
         self.env_prefix = None  # the environment variable prefix
         self.auto_env = False  # automatically bind options to env variables
 
+        # the env prefix used for the last env parse. the scheme options cache
+        # their env variable names, so those caches are cleared whenever the
+        # prefix changes.
+        self._last_env_prefix = None
+
         # the component configurations
         self._default = DotDict()
         self._config = DotDict()
         self._environment = DotDict()
         self._override = DotDict()
 
-        # the unified configuration.
+        # the version of each component configuration. a layer's version
+        # is only bumped when its data actually changes.
+        self._versions = (0, 0, 0, 0)
+
+        # the unified configuration, along with the layer versions it was
+        # built from.
         self._full_config = None
+        self._full_config_key = self._versions
+
+        # the merged default, config, and environment layers, along with
+        # the layers and versions it was built from. these change less
+        # frequently than the overrides, so they are cached separately.
+        self._base_config = None
+        self._base_config_key = None
+        self._base_layers = None
+
+        # the override layer the unified configuration was built from.
+        self._full_override = None
+
+        # the scheme, unified configuration, and layer versions of the last
+        # successful validation.
+        self._validated = None
 
     def __getitem__(self, item):
         # Set __getitem__ so the Bison config can be accessed via subscripting,
@@ -89,14 +192,72 @@ class Bison(object):
             (DotDict): A dictionary of configuration values that
                 allows lookups using dot notation.
         """
-        if self._full_config is None:
+        if not self._full_config_is_current():
+            layers = (self._default, self._config, self._environment)
+            base_key = self._versions[:_OVERRIDE]
+
+            # the base layers may have been replaced outright rather than
+            # through the _parse_* methods, so check that the cached base
+            # config was built from the current layers.
+            if self._base_config_key != base_key or self._base_layers_replaced():
+                self._validated = None
+                self._base_config = DotDict()
+                for layer in layers:
+                    self._base_config.merge(layer)
+                self._base_config_key = base_key
+                self._base_layers = layers
+
             self._full_config = DotDict()
-            self._full_config.merge(self._default)
-            self._full_config.merge(self._config)
-            self._full_config.merge(self._environment)
+            self._full_config.merge(self._base_config)
             self._full_config.merge(self._override)
+            self._full_config_key = self._versions
+            self._full_override = self._override
         return self._full_config
 
+    def _full_config_is_current(self):
+        """Check whether the unified config is built and up to date with the
+        versions of the component configurations.
+
+        Returns:
+            bool: True if the unified config is current; False otherwise.
+        """
+        return self._full_config is not None and self._full_config_key == self._versions
+
+    def _bump_version(self, layer):
+        """Bump the version of a component configuration after its data
+        changed.
+
+        Args:
+            layer (int): The index of the layer to bump the version of.
+        """
+        versions = list(self._versions)
+        versions[layer] += 1
+        self._versions = tuple(versions)
+
+    @staticmethod
+    def _changes(layer, values):
+        """Check whether updating a configuration layer with the given values
+        would change its data.
+
+        Args:
+            layer (dict): The configuration layer to update.
+            values (dict): The values to update the layer with.
+
+        Returns:
+            bool: True if the update changes the layer; False otherwise.
+        """
+        return any(dict.get(layer, k, _missing) != v for k, v in values.items())
+
+    def _base_layers_replaced(self):
+        """Check whether any of the default, config, or environment layers
+        were replaced since the base config was built.
+
+        Returns:
+            bool: True if the layers were replaced; False otherwise.
+        """
+        layers = (self._default, self._config, self._environment)
+        return self._base_layers is None or any(a is not b for a, b in zip(layers, self._base_layers))
+
     def get(self, key, default=None):
         """Get the value for the configuration `key`.
 
@@ -108,18 +269,80 @@ class Bison(object):
         Returns:
             The value for the given key, if it exists; `None` otherwise.
         """
+        # if the unified config is already built, use it.
+        if self._full_config_is_current():
+            return self._full_config.get(key, default)
+
+        # otherwise, look through the layers in order of precedence so the
+        # unified config does not need to be built for a single lookup. only
+        # non-dictionary values can be returned directly -- dictionaries
+        # need to be merged across the layers.
+        for layer in (self._override, self._environment, self._config, self._default):
+            value = self._lookup(layer, key)
+            if value is _missing:
+                continue
+            if value is _shadowed or isinstance(value, dict):
+                break
+            return value
+        else:
+            return default
         return self.config.get(key, default)
 
     def set(self, key, value):
         """Set a value in the `Bison` configuration.
 
+        If the unified `config` is already built, a non-dict value may be
+        written directly into it rather than rebuilding it, so a `config`
+        dictionary obtained before the call can reflect the new value. Take a
+        copy of the `config` if a snapshot of it is needed.
+
         Args:
             key (str): The configuration key to set a new value for.
             value: The value to set.
         """
-        # the configuration changes, so we invalidate the cached config
-        self._full_config = None
+        # overrides take precedence over all other layers, so if the unified
+        # config is already built, a non-dict value can be written straight
+        # through to it instead of rebuilding it. this is not the case for
+        # dict values, which need to be merged with the lower layers, or if
+        # the key was shadowed by a non-dict override, since that override
+        # may have been hiding values in the lower layers.
+        write_through = (
+            self._full_config_is_current()
+            and not isinstance(value, dict)
+            and self._lookup(self._override, key) is not _shadowed
+            and self._full_override is self._override
+            and not self._base_layers_replaced()
+        )
         self._override[key] = value
+        self._bump_version(_OVERRIDE)
+        self._validated = None
+
+        if write_through:
+            self._full_config[key] = value
+            self._full_config_key = self._versions
+
+    @staticmethod
+    def _lookup(layer, key):
+        """Look up the value for a dot notation key in a single configuration
+        layer.
+
+        Args:
+            layer (dict): The configuration layer to look in.
+            key (str): The key to get the value for.
+
+        Returns:
+            The value for the key in the layer. If the key is not in the layer,
+            `_missing` is returned. If a component of the key resolves to a
+            non-dictionary value, `_shadowed` is returned.
+        """
+        value = layer
+        for k in _split_key(key):
+            if not isinstance(value, dict):
+                return _missing if value is layer else _shadowed
+            value = value.get(k, _missing)
+            if value is _missing:
+                return _missing
+        return value
 
     def add_config_paths(self, *paths):
         """Add paths to search for the configuration file.
@@ -129,26 +352,62 @@ class Bison(object):
         """
         self.config_paths.extend(paths)
 
-    def validate(self):
+    def validate(self, force=False):
         """Validate the `Bison` configuration against the `Scheme`, if one
         is set.
 
+        If the configuration has not changed since it was last successfully
+        validated against the same `Scheme`, it is not validated again.
+        Changes made through `set` or parsing are picked up, but changes made
+        by modifying the `config` dictionary in place are not; use `force`
+        (or `clear_validation`) to validate the configuration regardless.
+
+        Args:
+            force (bool): Validate the configuration even if it was already
+                validated and has not changed since. (default: False)
+
         Raises:
             errors.SchemeValidationError: The `Bison` configuration fails
                 schema validation.
         """
         if self.scheme:
-            self.scheme.validate(self.config)
+            config = self.config
+            if self._validated is not None and not force:
+                scheme, validated_config, versions = self._validated
+                if scheme is self.scheme and validated_config is config and versions == self._versions:
+                    return
+
+            self._validated = None
+            self.scheme.validate(config)
+            self._validated = (self.scheme, config, self._versions)
+
+    def clear_validation(self):
+        """Clear the record of the last successful validation, so that the
+        next call to `validate` validates the configuration again.
+        """
+        self._validated = None
 
-    def parse(self, requires_cfg=True):
+    def parse(self, requires_cfg=True, parse_header_only=False):
         """Parse the configuration sources into `Bison`.
 
+        Parsed config files are cached by their path, inode, modification and
+        change times, and size, so parsing an unchanged file again does not
+        re-read it. A file which is rewritten in place to the same size within
+        a single tick of the filesystem timestamps can not be told apart from
+        the cached one, so its previous contents would be used. Replacing the
+        file (e.g. writing a new file and renaming it over the old one) always
+        gives it a new inode and is picked up.
+
         Args:
             requires_cfg (bool): Specify whether or not parsing should fail
                 if a config file is not found. (default: True)
+            parse_header_only (bool): Only parse the top-level entries at
+                the head of the config file, rather than the whole file. This
+                is useful when only identifying metadata is needed from a
+                large config file. (default: False)
         """
         self._parse_default()
-        self._parse_config(requires_cfg)
+        self._parse_config(requires_cfg, parse_header_only)
         self._parse_env()
 
     def _find_config(self):
@@ -165,22 +424,74 @@ class Bison(object):
             Exception: No paths are defined in `config_paths` or no file with
                 the `config_name` was found in any of the specified `config_paths`.
         """
+        names = tuple(self.config_name + ext for ext in self._fmt_to_ext[self.config_format])
         for search_path in self.config_paths:
-            for ext in self._fmt_to_ext.get(self.config_format):
-                path = os.path.abspath(os.path.join(search_path, self.config_name + ext))
+            for name in names:
+                path = os.path.abspath(os.path.join(search_path, name))
                 if os.path.isfile(path):
                     self.config_file = path
                     return
         raise BisonError('No file named {} found in search paths {}'.format(
             self.config_name, self.config_paths))
 
-    def _parse_config(self, requires_cfg=True):
+    def _peek_header(self, path, max_bytes=4096, parser=None):
+        """Parse the top-level entries at the head of a configuration file.
+
+        Only the first `max_bytes` of the file are read. If the file is
+        larger than that, the last top-level entry in the read buffer may be
+        incomplete, so it is dropped and only the entries before it are
+        parsed. If the header can not be parsed on its own into a mapping of
+        entries, this falls back to parsing the full file.
+
+        Args:
+            path (str): The path to the configuration file.
+            max_bytes (int): The maximum number of bytes to read for the
+                header. (default: 4096)
+            parser: The function used to parse the configuration data. If
+                not given, the parser for the `config_format` is used.
+
+        Returns:
+            The parsed configuration header.
+        """
+        if parser is None:
+            parser = self._fmt_to_parser[self.config_format]()
+
+        with open(path, 'rb') as f:
+            buf = f.read(max_bytes)
+            truncated = f.read(1) != b''
+
+        if truncated:
+            starts = [m.start() for m in _top_level_line.finditer(buf)]
+            # there needs to be at least one complete entry before the
+            # (potentially incomplete) last one.
+            if len(starts) > 1:
+                buf = buf[:starts[-1]]
+            else:
+                buf = None
+
+        if buf is not None:
+            try:
+                header = parser(buf)
+            except _yaml.YAMLError:
+                logger.info('Unable to parse config header, parsing full file')
+            else:
+                # e.g. a buffer holding only a document marker parses to None
+                if isinstance(header, dict):
+                    return header
+                logger.info('Config header is not a mapping, parsing full file')
+
+        with open(path, 'rb') as f:
+            return parser(f)
+
+    def _parse_config(self, requires_cfg=True, parse_header_only=False):
         """Parse the configuration file, if one is configured, and add it to
         the `Bison` state.
 
         Args:
             requires_cfg (bool): Specify whether or not parsing should fail
                 if a config file is not found. (default: True)
+            parse_header_only (bool): Only parse the top-level entries at
+                the head of the config file. (default: False)
         """
         if len(self.config_paths) > 0:
             try:
@@ -189,17 +500,24 @@ class Bison(object):
                 if not requires_cfg:
                     return
                 raise
+            parser = self._fmt_to_parser[self.config_format]()
             try:
-                with open(self.config_file, 'r') as f:
-                    parsed = self._fmt_to_parser[self.config_format](f)
+                if parse_header_only:
+                    parsed = self._peek_header(self.config_file, parser=parser)
+                else:
+                    st = os.stat(self.config_file)
+                    stat_key = (st.st_ino, st.st_mtime_ns, st.st_ctime_ns, st.st_size)
+                    parsed = copy.deepcopy(_load_config_file(parser, self.config_file, stat_key))
             except Exception as e:
                 raise BisonError(
                     'Failed to parse config file: {}'.format(self.config_file)
                 ) from e
 
-            # the configuration changes, so we invalidate the cached config
-            self._full_config = None
-            self._config = parsed
+            # only bump the version if the configuration changes, so that
+            # re-parsing the same file does not rebuild the unified config.
+            if parsed != self._config:
+                self._config = parsed
+                self._bump_version(_CONFIG)
 
     def _parse_env(self):
         """Parse the environment variables for any configuration if an `env_prefix`
@@ -212,17 +530,22 @@ class Bison(object):
             self.env_prefix = self.env_prefix + '_'
 
         # if there is no scheme, we won't know what to look for so only parse
-        # config if there is a scheme.
-        if self.scheme:
-            for k, v in self.scheme.flatten().items():
-                value = v.parse_env(k, self.env_prefix, self.auto_env)
-                if value is not None:
-                    env_cfg[k] = value
-
-        if len(env_cfg) > 0:
-            # the configuration changes, so we invalidate the cached config
-            self._full_config = None
+        # config if there is a scheme. if no option is bound to env and
+        # auto_env is off, nothing would be read from env, so skip it.
+        if self.scheme and (self.auto_env or self.scheme.has_env_bindings()):
+            flat = self.scheme.flatten()
+
+            if self.env_prefix != self._last_env_prefix:
+                for v in flat.values():
+                    v._env_key_cache.clear()
+                self._last_env_prefix = self.env_prefix
+
+            for k, v in self.scheme.parse_env(self.env_prefix, self.auto_env).items():
+                env_cfg[k] = v
+
+        if self._changes(self._environment, env_cfg):
             self._environment.update(env_cfg)
+            self._bump_version(_ENVIRONMENT)
 
     def _parse_default(self):
         """Parse the `Schema` for the `Bison` instance to create the set of
@@ -231,8 +554,8 @@ class Bison(object):
         If no defaults are specified in the `Schema`, the default dictionary
         will not contain anything.
         """
-        # the configuration changes, so we invalidate the cached config
-        self._full_config = None
-
         if self.scheme:
-            self._default.update(self.scheme.build_defaults())
+            defaults = self.scheme.build_defaults()
+            if self._changes(self._default, defaults):
+                self._default.update(defaults)
+                self._bump_version(_DEFAULT)
@@ -9,7 +9,9 @@ in order to do configuration defaults and validation. A
 here as well.
 """
 
+import functools
 import os
+from os import environ as _environ
 
 from bison import errors, utils
 
@@ -22,10 +24,251 @@ class NoDefault:
     a default value cannot be a NoneType check.
     """
 
+    def __reduce__(self):
+        # unpickle to the module's instance, so identity checks against it
+        # still hold for unpickled options.
+        return '_no_default'
 
-# global _NoDefault instance to use as the default value for options.
+
+# global _NoDefault instance to use as the default value for options. this
+# is the only instance, so options without a default can be identified with
+# an identity check against it.
 _no_default = NoDefault()
 
+# sentinel for "nothing found" when searching through values.
+_missing = object()
+
+
+def _short_str(value, limit=120):
+    """Get the string form of a value for use in an error message,
+    truncated if it is too long.
+
+    Args:
+        value: The value to get the string form of.
+        limit (int): The maximum length of the string, not including the
+            trailing ellipsis added to truncated strings. (default: 120)
+
+    Returns:
+        str: The (possibly truncated) string form of the value.
+    """
+    s = str(value)
+    if len(s) > limit:
+        s = s[:limit] + '...'
+    return s
+
+
+def _accept_all(value):
+    """A check which every value passes."""
+    return True
+
+
+def _accept_value(value):
+    """A cast which returns the value unchanged."""
+    return value
+
+
+def _copy_containers(value):
+    """Copy the dicts and lists within a value, sharing all other values.
+
+    Unlike a deep copy, this does not require the shared values to be
+    copyable (e.g. locks or modules), and they keep their identity.
+
+    Args:
+        value: The value to copy.
+
+    Returns:
+        The copy of the value.
+    """
+    value_type = type(value)
+    if value_type is dict:
+        return {k: _copy_containers(v) for k, v in value.items()}
+    if value_type is list:
+        return [_copy_containers(v) for v in value]
+    return value
+
+
+def _type_is(field_type, value):
+    """A check that a value is exactly of the given type."""
+    return type(value) is field_type
+
+
+def _type_in(types, value):
+    """A check that a value is exactly of one of the given types."""
+    return type(value) in types
+
+
+def _make_type_check(field_type):
+    """Make the function used to check a value against an option's type.
+
+    The value must be exactly of the type (or one of the types) given;
+    subclasses do not pass the check (e.g. `True` is not an `int`).
+
+    Args:
+        field_type (type|list|tuple|None): The type(s) a value should have.
+
+    Returns:
+        A function which takes a value and returns whether it has the
+        expected type.
+    """
+    if field_type is None:
+        return _accept_all
+
+    # the checks are partials of module-level functions, rather than
+    # closures, so that options holding them can be pickled.
+    if isinstance(field_type, (list, tuple)):
+        return functools.partial(_type_in, tuple(field_type))
+
+    return functools.partial(_type_is, field_type)
+
+
+# the common spellings of the bool strings, so casting them does not need to
+# build a lower-cased copy of the string.
+_bool_strings = {
+    'true': True, 'True': True, 'TRUE': True,
+    'false': False, 'False': False, 'FALSE': False,
+}
+
+
+def _cast_bool(value):
+    """Cast a string value to a bool.
+
+    A string can not be cast directly, since any non-empty string is truthy,
+    so the value is checked instead.
+    """
+    result = _bool_strings.get(value)
+    if result is None:
+        # any other spelling is compared case-insensitively.
+        result = value.lower() == 'true'
+    return result
+
+
+def _cast_to(field_type, value):
+    """Cast a value by calling the type on it."""
+    try:
+        return field_type(value)
+    except Exception as e:
+        raise errors.BisonError(
+            'Failed to cast {} to {}'.format(_short_str(value), field_type)
+        ) from e
+
+
+def _make_cast(field_type):
+    """Make the function used to cast a value to an option's type.
+
+    Args:
+        field_type (type|list|tuple|None): The type(s) a value should have.
+
+    Returns:
+        A function which takes a value and returns it cast to the type, or
+        None if casting to the type is not supported.
+    """
+    # if there is no type set for the option, the value is unchanged.
+    if field_type is None:
+        return _accept_value
+
+    if field_type is bool:
+        return _cast_bool
+
+    if field_type in (str, int, float):
+        return functools.partial(_cast_to, field_type)
+
+    # the option type is currently not supported
+    return None
+
+
+def _raise_member_conflict(value, _seen):
+    """A members check which fails for having both a type and a scheme."""
+    raise errors.SchemeValidationError(
+        'Cannot specify both a member_type and a member_scheme.'
+    )
+
+
+def _raise_bad_member_scheme(value, _seen):
+    """A members check which fails for a member scheme that is not a `Scheme`."""
+    raise errors.SchemeValidationError(
+        'Specified member scheme is not an instance of a Scheme.'
+    )
+
+
+def _check_member_types(name, member_type, value, _seen):
+    """A members check that all members are exactly of the given type."""
+    bad = next((item for item in value if type(item) is not member_type), _missing)
+    if bad is not _missing:
+        raise errors.SchemeValidationError(
+            'Members in "{}" option are not of type {}'.format(name, member_type)
+        )
+
+
+def _make_members_check(name, member_type, member_scheme):
+    """Make the function used to validate the members of a list option.
+
+    A misconfigured option is not rejected here. Instead, the returned
+    function raises, so that the error surfaces when a config is validated.
+
+    Args:
+        name (str): The name of the list option.
+        member_type (type|None): The type that all list members should have.
+        member_scheme (Scheme|None): The `Scheme` that all list members
+            should fulfil.
+
+    Returns:
+        A function which takes the list value and the `_seen` validation
+        memo and raises a `SchemeValidationError` if the members are
+        invalid, or None if there is nothing to check.
+    """
+    # the checks are module-level functions (or partials of them), rather
+    # than closures, so that options holding them can be pickled.
+    if member_scheme is not None and member_type is not None:
+        return _raise_member_conflict
+
+    if member_type is not None:
+        return functools.partial(_check_member_types, name, member_type)
+
+    if member_scheme is not None:
+        if not isinstance(member_scheme, Scheme):
+            return _raise_bad_member_scheme
+        return member_scheme.validate_many
+
+    return None
+
+
+def _in_choices(choices, value):
+    """A check that a value is one of the given choices."""
+    return value in choices
+
+
+def _in_choices_set(choices_set, value):
+    """A check that a value is in the given set of hashable choices."""
+    try:
+        return value in choices_set
+    except TypeError:
+        # an unhashable value can not be one of the hashable choices
+        return False
+
+
+def _make_choices_check(choices):
+    """Make the function used to check a value against an option's choices.
+
+    Hashable choices are checked with a set lookup. If any of the choices
+    are not hashable, they are checked by scanning them.
+
+    Args:
+        choices (list|tuple|None): The valid values for the option.
+
+    Returns:
+        A function which takes a value and returns whether it is one of
+        the choices.
+    """
+    if choices is None:
+        return _accept_all
+
+    try:
+        choices_set = frozenset(choices)
+    except TypeError:
+        return functools.partial(_in_choices, choices)
+
+    return functools.partial(_in_choices_set, choices_set)
+
 
 class Scheme(object):
     """The `Scheme` specifies the expected options for a configuration.
@@ -37,13 +280,92 @@ class Scheme(object):
     those options.
     """
 
+    __slots__ = (
+        'args', '_flat', '_defaults', '_compiled', '_name_to_arg',
+        '_required_names', '_required_set', '_dotted_names',
+        '_env_bindings',
+    )
+
     def __init__(self, *args):
         self.args = args
         self._flat = None
+        self._defaults = None
+
+        # lookup structures for validation, built from the args on first use.
+        self._compiled = None
+        self._name_to_arg = None
+        self._required_names = None
+        self._required_set = None
+        self._dotted_names = None
+        self._env_bindings = None
+
+    def _invalidate(self):
+        """Clear the cached state derived from the `Scheme` args.
+
+        This only needs to be called if the `args` are modified after
+        the `Scheme` has been used.
+        """
+        self._flat = None
+        self._defaults = None
+        self._compiled = None
+        self._name_to_arg = None
+        self._required_names = None
+        self._required_set = None
+        self._dotted_names = None
+        self._env_bindings = None
+
+    def _compile(self):
+        """Check the `Scheme` args and build the lookup structures used for
+        building defaults, flattening, and validation from them.
+
+        This is only done once per `Scheme`, the first time it is needed.
+
+        Raises:
+            errors.InvalidSchemeError: The `Scheme` does not contain
+                valid options.
+        """
+        if self._compiled is not None:
+            return
+
+        compiled = []
+        name_to_arg = {}
+        required = []
+        for arg in self.args:
+            if not isinstance(arg, _BaseOpt):
+                raise errors.InvalidSchemeError(
+                    'Scheme contains a non-Option type: {}'.format(arg)
+                )
+
+            # only a dict option can have a nested scheme.
+            sub_scheme = None
+            if isinstance(arg, DictOption) and isinstance(arg.scheme, Scheme):
+                sub_scheme = arg.scheme
+
+            compiled.append((arg.name, arg, arg.default is not _no_default, sub_scheme))
+            name_to_arg[arg.name] = arg
+
+            # an option is required only if it is marked as required and
+            # there is no default value to fall back to.
+            if arg.required and arg.default is _no_default:
+                required.append(arg.name)
+
+        self._required_names = tuple(required)
+        self._required_set = frozenset(required)
+
+        # option names may use dot notation to refer to nested values. those
+        # can not be matched against the top-level keys of a config.
+        self._dotted_names = any('.' in name for name in name_to_arg)
+        self._compiled = tuple(compiled)
+        self._name_to_arg = name_to_arg
 
     def build_defaults(self):
         """Build a dictionary of default values from the `Scheme`.
 
+        The defaults are only built once per `Scheme`; each call returns a
+        copy of them, so the caller is free to modify the returned dict. Only
+        the dicts and lists are copied: all other default values are the
+        objects given to the options, so they need not be copyable.
+
         Returns:
             dict: The default configurations as set by the `Scheme`.
 
@@ -51,23 +373,34 @@ class Scheme(object):
             errors.InvalidSchemeError: The `Scheme` does not contain
                 valid options.
         """
-        defaults = {}
-        for arg in self.args:
-            if not isinstance(arg, _BaseOpt):
-                raise errors.InvalidSchemeError('Unable to build default for non-Option type')
+        return _copy_containers(self._build_defaults())
 
-            # if there is a default set, add it to the defaults dict
-            if not isinstance(arg.default, NoDefault):
-                defaults[arg.name] = arg.default
+    def _build_defaults(self):
+        """Build the dictionary of default values from the `Scheme`, caching
+        the result.
 
-            # if we have a dict option, build the defaults for its scheme.
-            # if any defaults exist, use them.
-            if isinstance(arg, DictOption):
-                if arg.scheme:
-                    b = arg.scheme.build_defaults()
+        Returns:
+            dict: The cached default configurations for the `Scheme`. This
+                should not be modified by the caller.
+        """
+        if self._defaults is None:
+            self._compile()
+
+            defaults = {}
+            for name, arg, has_default, sub_scheme in self._compiled:
+                # if there is a default set, add it to the defaults dict
+                if has_default:
+                    defaults[name] = arg.default
+
+                # if we have a dict option, build the defaults for its scheme.
+                # if any defaults exist, use them.
+                if sub_scheme is not None:
+                    b = sub_scheme._build_defaults()
                     if b:
-                        defaults[arg.name] = b
-        return defaults
+                        defaults[name] = b
+
+            self._defaults = defaults
+        return self._defaults
 
     def flatten(self):
         """Flatten the scheme into a dictionary where the keys are
@@ -76,78 +409,304 @@ class Scheme(object):
 
         Returns:
             dict: The flattened `Scheme`.
+
+        Raises:
+            errors.InvalidSchemeError: The `Scheme` does not contain
+                valid options.
         """
         if self._flat is None:
-            flat = {}
-            for arg in self.args:
-                if isinstance(arg, Option):
-                    flat[arg.name] = arg
+            self._compile()
 
-                elif isinstance(arg, ListOption):
-                    flat[arg.name] = arg
+            flat = {}
+            for name, arg, _, sub_scheme in self._compiled:
+                flat[name] = arg
 
-                elif isinstance(arg, DictOption):
-                    flat[arg.name] = arg
-                    if arg.scheme:
-                        for k, v in arg.scheme.flatten().items():
-                            flat[arg.name + '.' + k] = v
+                # only a dict option has nested options to flatten.
+                if sub_scheme is not None:
+                    prefix = name + '.'
+                    for k, v in sub_scheme.flatten().items():
+                        flat[prefix + k] = v
 
             self._flat = flat
         return self._flat
 
-    def validate(self, config):
+    def has_env_bindings(self):
+        """Check whether any option in the `Scheme`, including nested options,
+        is bound to env.
+
+        Options which are not bound to env are only read from the environment
+        when `auto_env` is enabled, so if this is False and `auto_env` is not
+        set, there is nothing to parse from the environment.
+
+        Returns:
+            bool: True if any option is bound to env; False otherwise.
+
+        Raises:
+            errors.InvalidSchemeError: The `Scheme` does not contain
+                valid options.
+        """
+        if self._env_bindings is None:
+            self._env_bindings = any(
+                opt.bind_env not in (None, False) for opt in self.flatten().values()
+            )
+        return self._env_bindings
+
+    def parse_env(self, prefix=None, auto_env=False):
+        """Parse the environment for the values of all options in the `Scheme`.
+
+        The environment is scanned once for all of the `DictOption`s which are
+        bound to env, rather than once per `DictOption`. When such a scan is
+        needed, it takes a snapshot of the environment which the other options
+        are then looked up in.
+
+        Args:
+            prefix (str|None): The prefix to use for environment variables.
+            auto_env (bool): The `Bison` setting for auto_env.
+
+        Returns:
+            dict: The values found in the environment, keyed by the flattened
+                (dot notation) option key.
+
+        Raises:
+            errors.InvalidSchemeError: The `Scheme` does not contain
+                valid options.
+        """
+        values = {}
+        flat = self.flatten()
+
+        # the DictOptions bound to env, with their env prefix and the env
+        # variables found for them.
+        dict_opts = []
+        for key, opt in flat.items():
+            if isinstance(opt, DictOption):
+                env_key = opt._env_prefix(key, prefix)
+                if env_key is not None:
+                    dict_opts.append((env_key, key, opt, []))
+        dict_keys = {key for _, key, _, _ in dict_opts}
+
+        # the whole environment is read for the DictOptions anyway, so in that
+        # case copy it into a plain dict once for all of the lookups. otherwise,
+        # just look up the individual variables.
+        environ = dict(_environ) if dict_opts else _environ
+
+        for key, opt in flat.items():
+            if key in dict_keys:
+                # hold the option's place, so the values are in the same
+                # order as the flattened scheme.
+                values[key] = _missing
+            elif not isinstance(opt, DictOption):
+                value = opt.parse_env(key, prefix, auto_env, environ)
+                if value is not None:
+                    values[key] = value
+
+        if dict_opts:
+            # the env prefixes usually share a common prefix (e.g. the `Bison`
+            # env prefix), so the env variables which do not start with it can
+            # be skipped without checking them against every option prefix.
+            common = os.path.commonprefix([env_key for env_key, _, _, _ in dict_opts])
+            candidates = [(k, v) for k, v in environ.items() if k.startswith(common)]
+
+            # an env variable may match the prefix of more than one option,
+            # e.g. for nested DictOptions, so it is checked against all of them.
+            for k, v in candidates:
+                for env_key, _, _, matches in dict_opts:
+                    if k.startswith(env_key):
+                        matches.append((k[len(env_key):], v))
+
+            for _, key, opt, matches in dict_opts:
+                value = opt._from_env(matches)
+                if value is None:
+                    del values[key]
+                else:
+                    values[key] = value
+
+        return values
+
+    def validate(self, config, _seen=None):
         """Validate the given config against the `Scheme`.
 
         Args:
             config (dict): The configuration to validate.
+            _seen (dict|None): Internal. The configs which have already been
+                validated in the current validation pass, keyed by the
+                (scheme, config) identities.
 
         Raises:
             errors.SchemeValidationError: The configuration fails
                 validation against the `Schema`.
         """
-        if not isinstance(config, dict):
-            raise errors.SchemeValidationError(
-                'Scheme can only validate a dictionary config, but was given '
-                '{} (type: {})'.format(config, type(config))
-            )
+        self.validate_many((config,), _seen)
 
-        for arg in self.args:
-            # the option exists in the config
-            if arg.name in config:
-                arg.validate(arg.name, config[arg.name])
+    def validate_many(self, configs, _seen=None):
+        """Validate each of the given configs against the `Scheme`.
+
+        This is equivalent to calling `validate` for each config, but the
+        setup for validation is only done once, so it should be preferred
+        when validating many configs against the same `Scheme`, e.g. the
+        members of a `ListOption`.
+
+        Within a single validation pass, a config object which has already
+        been validated against this `Scheme` (e.g. the same dict repeated in
+        a list) is not validated again. This is safe since validation does
+        not modify the config. The memo holds a reference to each config it
+        has seen, so that a config freed during the pass can not have its id
+        reused by a later config which would then be skipped.
+
+        Args:
+            configs: An iterable of configurations to validate.
+            _seen (dict|None): Internal. The configs which have already been
+                validated in the current validation pass, keyed by the
+                (scheme, config) identities.
 
-            # the option does not exist in the config
-            else:
-                # if the option is not required, then it is fine to omit.
-                # otherwise, its omission constitutes a validation error unless
-                # a default value is specified for the option.
-                if arg.required and isinstance(arg.default, NoDefault):
-                    raise errors.SchemeValidationError(
-                        'Option "{}" is required, but not found.'.format(arg.name)
-                    )
+        Raises:
+            errors.SchemeValidationError: A configuration fails
+                validation against the `Schema`.
+        """
+        self._compile()
+        required_set = self._required_set
+        name_to_arg = self._name_to_arg
+        dotted_names = self._dotted_names
+
+        if _seen is None:
+            _seen = {}
+        scheme_id = id(self)
+
+        for config in configs:
+            seen_key = (scheme_id, id(config))
+            if seen_key in _seen:
+                continue
+            _seen[seen_key] = config
+
+            if not isinstance(config, dict):
+                raise errors.SchemeValidationError(
+                    'Scheme can only validate a dictionary config, but was given '
+                    '{} (type: {})'.format(_short_str(config), type(config))
+                )
+
+            # a dotted option name is looked up via the config (e.g. a
+            # `DotDict` resolves it to a nested value), so each option is
+            # looked up individually rather than by the config's top-level keys.
+            if dotted_names:
+                self._validate_options(config, _seen)
+                continue
+
+            # options which are not required are fine to omit. otherwise, their
+            # omission constitutes a validation error. all of the missing
+            # options are reported together.
+            if not config.keys() >= required_set:
+                self._raise_missing([n for n in self._required_names if n not in config])
+
+            # only the options present in the config need to be validated.
+            for name, value in config.items():
+                arg = name_to_arg.get(name)
+                if arg is not None:
+                    arg.validate(name, value, _seen=_seen)
+
+    def _validate_options(self, config, _seen):
+        """Validate a config by looking up each of the `Scheme` options in it.
+
+        This is used when the option names use dot notation, so they can not
+        be matched against the top-level keys of the config.
+
+        Args:
+            config (dict): The configuration to validate.
+            _seen (dict): The configs which have already been validated in
+                the current validation pass.
+
+        Raises:
+            errors.SchemeValidationError: The configuration fails
+                validation against the `Schema`.
+        """
+        required_set = self._required_set
+
+        found, missing = [], []
+        for name, arg, _, _ in self._compiled:
+            value = config.get(name, _missing)
+            if value is not _missing:
+                found.append((name, arg, value))
+            elif name in required_set:
+                missing.append(name)
+
+        if missing:
+            self._raise_missing(missing)
+
+        for name, arg, value in found:
+            arg.validate(name, value, _seen=_seen)
+
+    @staticmethod
+    def _raise_missing(missing):
+        """Raise the validation error for required options which are missing
+        from a config.
+
+        Args:
+            missing (list[str]): The names of the missing options.
+
+        Raises:
+            errors.SchemeValidationError: Always.
+        """
+        raise errors.SchemeValidationError(
+            '{} "{}" {} required, but not found.'.format(
+                'Option' if len(missing) == 1 else 'Options',
+                '", "'.join(missing),
+                'is' if len(missing) == 1 else 'are',
+            )
+        )
 
 
 class _BaseOpt(object):
     """Base class for all scheme options"""
 
+    # options are created for every field of a scheme and have a fixed set
+    # of attributes, so they do not need a per-instance __dict__.
+    __slots__ = ('name', 'required', 'default', '_env_key_cache')
+
     def __init__(self):
         self.name = None
-        self.default = NoDefault
+        self.required = True
+        self.default = _no_default
+
+        # cache of (prefix, key) to the corresponding environment variable
+        # name for the option.
+        self._env_key_cache = {}
+
+    def _env_key(self, key, prefix=None):
+        """Get the name of the environment variable for the option.
+
+        The name is built from the option's key, where dots are replaced with
+        underscores, and the given prefix. Built names are cached on the option.
+
+        Args:
+            key (str): The full key (dot notation) for the option.
+            prefix (str|None): The prefix to use for the environment variable.
+
+        Returns:
+            str: The environment variable name.
+        """
+        env_key = self._env_key_cache.get((prefix, key))
+        if env_key is None:
+            env_key = key.replace('.', '_').upper()
+            if prefix:
+                env_key = prefix.upper() + env_key
+            self._env_key_cache[(prefix, key)] = env_key
+        return env_key
 
-    def validate(self, key, value):
+    def validate(self, key, value, _seen=None):
         """Validate that the option constraints are met by the configuration.
 
         Args:
             key: The key name for the option. This is used to identify the
                 field on error.
             value: The value corresponding with the option.
+            _seen (dict|None): Internal. The configs which have already been
+                validated in the current validation pass, keyed by the
+                (scheme, config) identities.
 
         Raises:
             errors.SchemeValidationError: The option failed validation.
         """
         raise NotImplementedError
 
-    def parse_env(self, key=None, prefix=None, auto_env=False):
+    def parse_env(self, key=None, prefix=None, auto_env=False, environ=None):
         """Parse the environment based on the option configuration.
 
         Args:
@@ -159,6 +718,8 @@ class _BaseOpt(object):
                 This is set in the `Bison` object and should be passed in
                 here.
             auto_env (bool): The `Bison` setting for auto_env.
+            environ (dict|None): The environment variables to parse. If None,
+                this will use `os.environ`.
 
         Returns:
             The value(s) for the option from the environment, if found. If
@@ -194,6 +755,8 @@ class Option(_BaseOpt):
         bind_env (bool|str|None): Bind the option to an environment variable.
     """
 
+    __slots__ = ('type', 'choices', 'bind_env', '_type_check', '_choices_check', '_cast')
+
     def __init__(self, name, required=True, default=_no_default, field_type=None, choices=None, bind_env=None):
         super(Option, self).__init__()
         self.name = name
@@ -203,27 +766,30 @@ class Option(_BaseOpt):
         self.choices = choices
         self.bind_env = bind_env
 
-    def validate(self, key, value):
-        if self.type is not None:
-            if isinstance(self.type, (list, tuple)):
-                if type(value) not in self.type:
-                    raise errors.SchemeValidationError(
-                        '{}={} : value is of type {}, but should be {}'.format(key, value, type(value), self.type)
-                    )
-            else:
-                if type(value) != self.type:
-                    raise errors.SchemeValidationError(
-                        '{}={} : value is of type {}, but should be {}'.format(key, value, type(value), self.type)
-                    )
-
-        if (self.choices is not None) and (value not in self.choices):
+        # resolve the checks for the option constraints up front, so
+        # validation does not need to branch on how the option is set up.
+        self._type_check = _make_type_check(field_type)
+        self._choices_check = _make_choices_check(choices)
+        self._cast = _make_cast(field_type)
+
+    def validate(self, key, value, _seen=None):
+        if not self._type_check(value):
             raise errors.SchemeValidationError(
-                '{}={} : value is not in the valid choice options: {}'.format(key, value, self.choices)
+                '{}={} : value is of type {}, but should be {}'.format(
+                    key, _short_str(value), type(value), self.type)
             )
 
-    def parse_env(self, key=None, prefix=None, auto_env=False):
+        if not self._choices_check(value):
+            raise errors.SchemeValidationError(
+                '{}={} : value is not in the valid choice options: {}'.format(
+                    key, _short_str(value), self.choices)
+            )
+
+    def parse_env(self, key=None, prefix=None, auto_env=False, environ=None):
         if key is None:
             key = self.name
+        if environ is None:
+            environ = _environ
 
         # we explicitly do not want to bind the option to env
         if self.bind_env is False:
@@ -232,13 +798,9 @@ class Option(_BaseOpt):
         # we want to bind the option to env. in this case, bind_env is
         # generated from the Option key.
         elif self.bind_env is True:
-            env_key = key.replace('.', '_').upper()
-
-            # if an env prefix exists, use it
-            if prefix:
-                env_key = prefix.upper() + env_key
+            env_key = self._env_key(key, prefix)
 
-            env = os.environ.get(env_key, None)
+            env = environ.get(env_key)
             if env is not None:
                 return self.cast(env)
 
@@ -247,7 +809,7 @@ class Option(_BaseOpt):
         elif isinstance(self.bind_env, str):
             env_key = self.bind_env
 
-            env = os.environ.get(env_key, None)
+            env = environ.get(env_key)
             if env is not None:
                 return self.cast(env)
 
@@ -256,13 +818,9 @@ class Option(_BaseOpt):
         # lookups if auto_env is set.
         elif self.bind_env is None:
             if auto_env:
-                env_key = key.replace('.', '_').upper()
+                env_key = self._env_key(key, prefix)
 
-                # if an env prefix exists, use it
-                if prefix:
-                    env_key = prefix.upper() + env_key
-
-                env = os.environ.get(env_key, None)
+                env = environ.get(env_key)
                 if env is not None:
                     return self.cast(env)
         return None
@@ -279,28 +837,10 @@ class Option(_BaseOpt):
         Returns:
             The value casted to the expected type for the option.
         """
-        # if there is no type set for the option, return the given
-        # value unchanged.
-        if self.type is None:
-            return value
-
-        # cast directly
-        if self.type in (str, int, float):
-            try:
-                return self.type(value)
-            except Exception as e:
-                raise errors.BisonError(
-                    'Failed to cast {} to {}'.format(value, self.type)
-                ) from e
-
-        # for bool, can't cast a string, since a string is truthy,
-        # so we need to check the value.
-        elif self.type == bool:
-            return value.lower() == 'true'
-
-        # the option type is currently not supported
-        else:
+        cast = self._cast
+        if cast is None:
             raise errors.BisonError('Unsupported type for casting: {}'.format(self.type))
+        return cast(value)
 
 
 class DictOption(_BaseOpt):
@@ -337,6 +877,8 @@ class DictOption(_BaseOpt):
             as a string.
     """
 
+    __slots__ = ('scheme', 'bind_env', '_scheme_check')
+
     def __init__(self, name, scheme, required=True, default=_no_default, bind_env=False):
         super(DictOption, self).__init__()
         self.name = name
@@ -345,39 +887,82 @@ class DictOption(_BaseOpt):
         self.scheme = scheme
         self.bind_env = bind_env
 
-    def validate(self, key, value):
+        # the nested scheme validation is resolved once, rather than checking
+        # and looking up the scheme for every validated value.
+        self._scheme_check = scheme.validate_many if isinstance(scheme, Scheme) else None
+
+    def validate(self, key, value, _seen=None):
         if not isinstance(value, dict):
-            raise errors.SchemeValidationError('{}={} : value is not a dictionary'.format(key, value))
+            raise errors.SchemeValidationError('{}={} : value is not a dictionary'.format(key, _short_str(value)))
 
-        if isinstance(self.scheme, Scheme):
-            self.scheme.validate(value)
+        if self._scheme_check is not None:
+            self._scheme_check((value,), _seen)
 
-    def parse_env(self, key=None, prefix=None, auto_env=False):
+    def parse_env(self, key=None, prefix=None, auto_env=False, environ=None):
         if key is None:
             key = self.name
+        if environ is None:
+            environ = _environ
 
-        # we explicitly do not want to bind the option to env
-        if self.bind_env is False:
+        env_key = self._env_prefix(key, prefix)
+        if env_key is None:
             return None
 
+        return self._from_env(
+            (k[len(env_key):], v) for k, v in environ.items() if k.startswith(env_key)
+        )
+
+    def _env_prefix(self, key, prefix=None):
+        """Get the prefix of the environment variables which populate
+        the option.
+
+        Args:
+            key (str): The full key (dot notation) to use for the option.
+            prefix (str|None): The prefix to use for environment variables.
+
+        Returns:
+            str|None: The environment variable prefix for the option, or None
+                if the option is not bound to env.
+        """
         # we want to populate the dict from env. the dict option key
         # will generate the prefix. anything after the prefix will be
         # part of the populated value(s)
-        elif self.bind_env is True:
-            env_key = key.replace('.', '_').upper()
-            if prefix:
-                env_key = prefix.upper() + env_key
+        if self.bind_env is not True:
+            return None
+
+        env_key = self._env_key(key, prefix)
+        if not env_key.endswith('_'):
+            env_key = env_key + '_'
+        return env_key
 
-            if not env_key.endswith('_'):
-                env_key = env_key + '_'
+    @staticmethod
+    def _from_env(matches):
+        """Build the option value from the environment variables which
+        matched its prefix.
 
-            values = utils.DotDict()
-            for k, v in os.environ.items():
-                if k.startswith(env_key):
-                    dot_key = k[len(env_key):].replace('_', '.').lower()
-                    values[dot_key] = v
-            if values:
-                return values
+        Args:
+            matches: An iterable of (name, value) tuples, where the name is
+                the environment variable name with the option prefix removed.
+
+        Returns:
+            utils.DotDict|None: The values for the option, or None if there
+                were no matches.
+        """
+        # build the nested dicts directly rather than going through the
+        # dot notation lookups of DotDict for every variable.
+        values = {}
+        for k, v in matches:
+            parts = k.replace('_', '.').lower().split('.')
+            dct = values
+            for part in parts[:-1]:
+                nested = dct.get(part)
+                if not isinstance(nested, dict):
+                    nested = dct[part] = {}
+                dct = nested
+            dct[parts[-1]] = v
+
+        if values:
+            return utils.DotDict(values)
         return None
 
 
@@ -415,6 +1000,8 @@ class ListOption(_BaseOpt):
             items being comma separated.
     """
 
+    __slots__ = ('member_type', 'member_scheme', 'bind_env', '_members_check')
+
     def __init__(self, name, required=True, default=_no_default, member_type=None, member_scheme=None, bind_env=False):
         super(ListOption, self).__init__()
         self.name = name
@@ -424,45 +1011,30 @@ class ListOption(_BaseOpt):
         self.member_scheme = member_scheme
         self.bind_env = bind_env
 
-    def validate(self, key, value):
-        if not isinstance(value, list):
-            raise errors.SchemeValidationError('{}={} : value is not a list'.format(key, value))
-
-        if self.member_scheme is not None and self.member_type is not None:
-            raise errors.SchemeValidationError(
-                'Cannot specify both a member_type and a member_scheme.'
-            )
-
-        if self.member_type is not None:
-            for item in value:
-                if type(item) != self.member_type:
-                    raise errors.SchemeValidationError(
-                        'Members in "{}" option are not of type {}'.format(self.name, self.member_type)
-                    )
+        # precompute the check for the list members
+        self._members_check = _make_members_check(name, member_type, member_scheme)
 
-        if self.member_scheme is not None:
-            if not isinstance(self.member_scheme, Scheme):
-                raise errors.SchemeValidationError(
-                    'Specified member scheme is not an instance of a Scheme.'
-                )
+    def validate(self, key, value, _seen=None):
+        if not isinstance(value, list):
+            raise errors.SchemeValidationError('{}={} : value is not a list'.format(key, _short_str(value)))
 
-            for item in value:
-                self.member_scheme.validate(item)
+        if self._members_check is not None:
+            self._members_check(value, _seen)
 
-    def parse_env(self, key=None, prefix=None, auto_env=False):
+    def parse_env(self, key=None, prefix=None, auto_env=False, environ=None):
         if key is None:
             key = self.name
+        if environ is None:
+            environ = _environ
 
         # we explicitly do not want to bind the option to env
         if self.bind_env is False:
             return None
 
         elif self.bind_env is True:
-            env_key = key.replace('.', '_').upper()
-            if prefix:
-                env_key = prefix.upper() + env_key
+            env_key = self._env_key(key, prefix)
 
-            value = os.environ.get(env_key, None)
+            value = environ.get(env_key)
             if value:
                 return value.split(',')
 
@@ -6,7 +6,26 @@ bison.utils
 Utilities for `bison`.
 """
 
-import collections
+import functools
+
+# sentinel for a key which is not found in a dictionary.
+_missing = object()
+
+
+@functools.lru_cache(maxsize=1024)
+def _split_key(key):
+    """Split a dot notation key into its components.
+
+    The same keys tend to be used over and over (e.g. the flattened keys
+    of a `Scheme`), so the results are memoized.
+
+    Args:
+        key (str): The dot notation key to split.
+
+    Returns:
+        tuple[str]: The components of the key.
+    """
+    return tuple(key.split('.'))
 
 
 def build_dot_value(key, value):
@@ -28,27 +47,47 @@ def build_dot_value(key, value):
     # if there is no nesting in the key (as specified by the
     # presence of dot notation), then the key/value pair here
     # are the final key value pair.
-    if key.count('.') == 0:
+    if '.' not in key:
         return key, value
+    return build_dot_value_from_parts(_split_key(key), value)
+
 
-    # otherwise, we will need to construct as many dictionaries
-    # as there are dot components to hold the value.
-    final_value = value
-    reverse_split = key.split('.')[::-1]
-    end = len(reverse_split) - 1
-    for idx, k in enumerate(reverse_split):
-        if idx == end:
-            return k, final_value
-        final_value = {k: final_value}
+def build_dot_value_from_parts(parts, value):
+    """Build new dictionaries based off of the components of an already
+    split dot notation key.
+
+    For example, if the parts were ['x', 'y', 'z'] and the value was 'foo',
+    we would expect a return value of: ('x', {'y': {'z': 'foo'}})
+
+    Args:
+        parts (list[str]): The components of the dot notation key.
+        value: The value associated with the key.
+
+    Returns:
+        tuple: A 2-tuple where the first element is the key of
+            the outermost scope and the value is the constructed
+            value for that key.
+    """
+    # construct as many dictionaries as there are nested components
+    # to hold the value, from the innermost outwards.
+    for k in reversed(parts[1:]):
+        value = {k: value}
+    return parts[0], value
 
 
 class DotDict(dict):
     """A dictionary which supports getting and setting with dot notation keys."""
 
+    # the data is held by the dict itself, so no instance `__dict__` is needed.
+    __slots__ = ()
+
     def __init__(self, dct=None):
+        # only pass the source dict through if there is one, so that an
+        # empty DotDict does not need a throwaway empty dict to copy from.
         if dct is None:
-            dct = {}
-        super(DotDict, self).__init__(dct)
+            super(DotDict, self).__init__()
+        else:
+            super(DotDict, self).__init__(dct)
 
     def __getitem__(self, item):
         # x.__getitem__(y) <==> x[y], so this makes x[y] and x.get(y) go
@@ -56,40 +95,31 @@ class DotDict(dict):
         return self.get(item, None)
 
     def __setitem__(self, key, value):
-        # if there are no dots in the key, its a normal set
-        if key.count('.') == 0:
-            super(DotDict, self).__setitem__(key, value)
-            return
-
-        # otherwise, traverse the key components to set the value
-        first, remainder = key.split('.', 1)
-        if first in self:
-            elem = super(DotDict, self).__getitem__(first)
-            if isinstance(elem, dict):
-                dd = DotDict(elem)
-                dd.__setitem__(remainder, value)
-                elem.update(dd)
-            else:
-                k, v = build_dot_value(key, value)
-                super(DotDict, self).__setitem__(k, v)
-
-        else:
-            k, v = build_dot_value(key, value)
-            super(DotDict, self).__setitem__(k, v)
+        # traverse the key components down to the dictionary which holds the
+        # last component, creating (or replacing non-dict values with) new
+        # dictionaries along the way. the nested dictionaries are modified in
+        # place via the base dict methods, so they do not need to be wrapped.
+        parts = _split_key(key)
+        dct = self
+        for k in parts[:-1]:
+            elem = dict.get(dct, k)
+            if not isinstance(elem, dict):
+                elem = {}
+                dict.__setitem__(dct, k, elem)
+            dct = elem
+        dict.__setitem__(dct, parts[-1], value)
 
     def __contains__(self, item):
-        # if there are no dots in the key, it is a normal contains
-        if item.count('.') == 0:
-            return super(DotDict, self).__contains__(item)
-
-        # otherwise, traverse the key components to check contains
-        first, remainder = item.split('.', 1)
-        if first in self:
-            v = super(DotDict, self).__getitem__(first)
-            if isinstance(v, (dict, DotDict)):
-                return DotDict(v).__contains__(remainder)
-            return False
-        return False
+        # traverse the key components to check contains. each level is
+        # probed once, bailing out as soon as a component is not found.
+        dct = self
+        for k in _split_key(item):
+            if not isinstance(dct, dict):
+                return False
+            dct = dict.get(dct, k, _missing)
+            if dct is _missing:
+                return False
+        return True
 
     # ---------------------------------------
     # Public Facing Methods
@@ -110,28 +140,17 @@ class DotDict(dict):
             default: The return value should the given key
                 not exist in the `DotDict`.
         """
-        # if there are no dots in the key, its a normal get
-        if key.count('.') == 0:
-            return super(DotDict, self).get(key, default)
-
-        # set the return value to the default
-        value = default
-
-        # split the key into the first component and the rest of
-        # the components. the first component corresponds to this
-        # DotDict. the remainder components correspond to any nested
-        # DotDicts.
-        first, remainder = key.split('.', 1)
-        if first in self:
-            value = super(DotDict, self).get(first, default)
-
-            # if the value for the key at this level is a dictionary,
-            # then pass the remainder to that DotDict.
-            if isinstance(value, (dict, DotDict)):
-                return DotDict(value).get(remainder, default)
-
+        # traverse the key components through the nested dictionaries. if
+        # a component is missing, or its value is not a dictionary when there
+        # are still components left, the key is not found.
+        value = self
+        for k in _split_key(key):
             # TODO: support lists
-
+            if not isinstance(value, dict):
+                return default
+            value = dict.get(value, k, _missing)
+            if value is _missing:
+                return default
         return value
 
     def delete(self, key):
@@ -147,28 +166,19 @@ class DotDict(dict):
         Args:
             key (str): The key to remove.
         """
+        # traverse the key components down to the dictionary which holds the
+        # last component, e.g. 'z' in 'x.y.z', and delete it from there. the
+        # nested dictionaries are accessed via the base dict methods, so every
+        # level (including this DotDict) is checked the same way.
+        keys = _split_key(key)
         dct = self
-        keys = key.split('.')
-        last_key = keys[-1]
-        for k in keys:
-            # if the key is the last one, e.g. 'z' in 'x.y.z', try
-            # to delete it from its dict.
-            if k == last_key:
-                del dct[k]
-                break
-
-            # if the dct is a DotDict, get the value for the key `k` from it.
-            if isinstance(dct, DotDict):
-                dct = super(DotDict, dct).__getitem__(k)
-
-            # otherwise, just get the value from the default __getitem__
-            # implementation.
-            else:
-                dct = dct.__getitem__(k)
-                if not isinstance(dct, (DotDict, dict)):
-                    raise KeyError(
-                        'Subkey "{}" in "{}" invalid for deletion'.format(k, key)
-                    )
+        for k in keys[:-1]:
+            dct = dict.__getitem__(dct, k)
+            if not isinstance(dct, dict):
+                raise KeyError(
+                    'Subkey "{}" in "{}" invalid for deletion'.format(k, key)
+                )
+        dict.__delitem__(dct, keys[-1])
 
     def merge(self, source):
         """Merge the dictionary with the values from another dictionary
@@ -210,28 +220,55 @@ class DotDict(dict):
 def _merge(d, u):
     """Merge two dictionaries (or DotDicts) together.
 
+    Nested dictionaries are merged using an explicit stack of the
+    (dictionary to merge into, source) pairs, rather than recursion.
+
     Args:
           d: The dictionary/DotDict to merge into.
           u: The source of the data to merge.
     """
-    for k, v in u.items():
-        # if we have a mapping, recursively merge the values
-        if isinstance(v, collections.Mapping):
-            d[k] = _merge(d.get(k, {}), v)
-
-        # if d (the dict to merge into) is a dict, just add the
-        # value to the dict.
-        elif isinstance(d, collections.MutableMapping):
-            d[k] = v
-
-        # otherwise if d (the dict to merge into) is not a dict (e.g. when
-        # recursing into it, `d.get(k, {})` may not be a dict), then do what
-        # `update` does and prefer the new value.
-        #
-        # this means that something like `{'foo': 1}` when updated with
-        # `{'foo': {'bar': 1}}` would have the original value (`1`) overwritten
-        # and would become: `{'foo': {'bar': 1}}`
-        else:
-            d = {k: v}
+    # each stack entry also tracks whether the dictionary to merge into was
+    # created by the merge, in which case it is known to be an empty dict.
+    stack = [(d, u, False)]
+    while stack:
+        dst, src, fresh = stack.pop()
+
+        # there is nothing to merge with in a new dict, so its values can be
+        # bulk copied with `update`. only the nested dictionaries need to be
+        # replaced with new ones, so the source dictionaries are not shared.
+        if fresh:
+            dst.update(src)
+            for k, v in src.items():
+                if isinstance(v, dict):
+                    nested = {}
+                    dst[k] = nested
+                    stack.append((nested, v, True))
+            continue
+
+        dst_get = dst.get
+        for k, v in src.items():
+            # if we have a mapping, merge the values. isinstance already
+            # short-circuits on an exact type match, so plain dicts need no
+            # separate `type(v) is dict` check.
+            if isinstance(v, dict):
+                existing = dst_get(k, _missing)
+                if isinstance(existing, dict):
+                    stack.append((existing, v, False))
+
+                # if the value to merge into is not a dict, then do what
+                # `update` does and prefer the new value. an empty source
+                # has nothing to merge, so an existing value is kept.
+                #
+                # this means that something like `{'foo': 1}` when updated
+                # with `{'foo': {'bar': 1}}` would have the original value
+                # (`1`) overwritten and would become: `{'foo': {'bar': 1}}`
+                elif existing is _missing or v:
+                    nested = {}
+                    dst[k] = nested
+                    stack.append((nested, v, True))
+
+            # otherwise, just add the value to the dict.
+            else:
+                dst[k] = v
 
     return d
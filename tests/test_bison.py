@@ -1,8 +1,11 @@
 """Unit tests for bison.bison"""
 
+import copy
 import os
+import sys
 
 import pytest
+import yaml
 
 import bison
 from bison import errors
@@ -99,6 +102,50 @@ class TestBison:
         value = b[key]
         assert value == expected
 
+    @pytest.mark.parametrize(
+        'key,expected', [
+            ('foo', 'override'),
+            ('bar', 1),
+            ('nested.a', 'env'),
+            ('nested.b', 'default'),
+            ('nested', {'a': 'env', 'b': 'default'}),
+            ('missing', None),
+            ('missing.key', None),
+        ]
+    )
+    def test_get_layered(self, key, expected):
+        """Get config values from Bison without building the full config."""
+        b = bison.Bison()
+        b._default = bison.DotDict({'foo': 'default', 'nested': {'a': 'default', 'b': 'default'}})
+        b._config = bison.DotDict({'foo': 'config', 'bar': {'baz': 2}})
+        b._environment = bison.DotDict({'nested': {'a': 'env'}})
+        b._override = bison.DotDict({'foo': 'override', 'bar': 1})
+
+        assert b.get(key) == expected
+        assert b.get(key) == b.config.get(key)
+
+    @pytest.mark.parametrize('key', ['bar.baz', 'nested.a.x'])
+    def test_get_layered_shadowed(self, key):
+        """Get config values whose path is interrupted by a non-dict value."""
+        b = bison.Bison()
+        b._config = bison.DotDict({'bar': {'baz': 2}})
+        b._environment = bison.DotDict({'nested': {'a': 'env'}})
+        b._override = bison.DotDict({'bar': 1})
+
+        value = b.get(key)
+        b._full_config = None
+        assert value == b.config.get(key)
+
+    def test_get_layered_no_merge(self):
+        """Getting a non-dict value does not build the full config."""
+        b = bison.Bison()
+        b._default = bison.DotDict({'foo': {'bar': 'baz'}})
+        b.set('foo.baz', 1)
+
+        assert b.get('foo.bar') == 'baz'
+        assert b.get('foo.baz') == 1
+        assert b._full_config is None
+
     @pytest.mark.parametrize(
         'key,value', [
             ('foo', 'bar'),
@@ -260,6 +307,102 @@ class TestBison:
             }
         }
 
+    def test_set_write_through_same_object(self):
+        """Setting a non-dict value on a built config updates that config object
+        in place, while a dict value builds a new config object.
+        """
+        b = bison.Bison()
+        b.set('foo', 'bar')
+
+        config = b.config
+        snapshot = copy.deepcopy(config)
+        b.set('foo', 'baz')
+        assert b.config is config
+        assert config == {'foo': 'baz'}
+        assert snapshot == {'foo': 'bar'}
+
+        b.set('bar', {'a': 1})
+        assert b.config is not config
+        assert config == {'foo': 'baz'}
+        assert b.config == {'foo': 'baz', 'bar': {'a': 1}}
+
+    @pytest.mark.parametrize(
+        'key,value', [
+            ('foo', 'baz'),
+            ('foo.bar', 1),
+            ('bar', None),
+            ('bar.bat.a', None),
+            ('bar.bat', 'test'),
+            ('bar.bat', {'c': 'test'}),
+            ('bar.new', [1, 2, 3]),
+            ('shadow.a', 1),
+            ('shadow.bird', 'warbler'),
+        ]
+    )
+    def test_set_write_through(self, key, value):
+        """Setting a value on a built config gives the same result as rebuilding it."""
+        b = bison.Bison()
+        b._config = bison.DotDict({
+            'foo': 'bar',
+            'bar': {'bat': {'a': 'test', 'b': 'test'}},
+            'shadow': {'bird': 'owl'},
+        })
+        b._override = bison.DotDict({'shadow': 'value'})
+        assert len(b.config) == 3
+
+        b.set(key, value)
+        actual = b.config
+
+        b._full_config = None
+        assert actual == b.config
+
+    def test_set_keeps_base_config(self):
+        """Setting an override should not rebuild the merged base layers."""
+        b = bison.Bison()
+        b._config = bison.DotDict({'foo': 'bar', 'bar': {'baz': 1}})
+        assert b.config == {'foo': 'bar', 'bar': {'baz': 1}}
+
+        base = b._base_config
+        assert base == {'foo': 'bar', 'bar': {'baz': 1}}
+
+        b.set('bar.baz', 2)
+        assert b.config == {'foo': 'bar', 'bar': {'baz': 2}}
+        assert b._base_config is base
+        assert base == {'foo': 'bar', 'bar': {'baz': 1}}
+
+        # nothing changes in the base layers, so they are not re-merged
+        b._parse_default()
+        assert b._base_config is base
+
+    def test_parse_twice_keeps_config(self, yaml_config):
+        """Parsing the same sources again does not rebuild the config."""
+        b = bison.Bison(scheme=bison.Scheme(
+            bison.Option('foo', default=False, field_type=bool),
+        ))
+        b.add_config_paths(os.path.dirname(yaml_config))
+        b.parse()
+
+        config = b.config
+        versions = b._versions
+
+        b.parse()
+        assert b._versions == versions
+        assert b.config is config
+
+    def test_parse_changed_rebuilds_config(self, yaml_config):
+        """Parsing sources whose data changed rebuilds the config."""
+        b = bison.Bison()
+        b.add_config_paths(os.path.dirname(yaml_config))
+        b.parse()
+
+        config = b.config
+        assert config['foo'] is True
+
+        yaml_config.write('foo: false\n')
+        b.parse()
+        assert b.config is not config
+        assert b.config['foo'] is False
+
     @pytest.mark.parametrize(
         'paths', [
             (),
@@ -307,6 +450,87 @@ class TestBison:
         with pytest.raises(errors.SchemeValidationError):
             b.validate()
 
+    def test_validate_dotted_option(self):
+        """Validate the Bison configuration against an option with a dotted name."""
+        b = bison.Bison(scheme=bison.Scheme(
+            bison.Option('foo.bar', field_type=int)
+        ))
+        b.set('foo.bar', 1)
+        b.validate()
+
+        b.set('foo.bar', 'baz')
+        with pytest.raises(errors.SchemeValidationError):
+            b.validate()
+
+    def test_validate_unchanged(self, monkeypatch):
+        """Validating an unchanged Bison configuration does not validate it again."""
+        b = bison.Bison(scheme=bison.Scheme(
+            bison.Option('foo', field_type=str)
+        ))
+        b.set('foo', 'bar')
+
+        calls = []
+        validate = bison.Scheme.validate
+        monkeypatch.setattr(bison.Scheme, 'validate', lambda *a: calls.append(a) or validate(*a))
+
+        b.validate()
+        b.validate()
+        assert len(calls) == 1
+
+        # changing the config validates it again
+        b.set('foo', 1)
+        with pytest.raises(errors.SchemeValidationError):
+            b.validate()
+        with pytest.raises(errors.SchemeValidationError):
+            b.validate()
+        assert len(calls) == 3
+
+    def test_validate_in_place_edit(self):
+        """Validate the Bison configuration after modifying it in place."""
+        b = bison.Bison(scheme=bison.Scheme(
+            bison.Option('foo', field_type=str)
+        ))
+        b.set('foo', 'bar')
+        b.validate()
+
+        # modifying the config in place does not change the layer versions,
+        # so validating it again needs to be forced.
+        b.config['foo'] = 1
+        b.validate()
+        with pytest.raises(errors.SchemeValidationError):
+            b.validate(force=True)
+
+        # a failed validation is not remembered
+        with pytest.raises(errors.SchemeValidationError):
+            b.validate()
+
+    def test_clear_validation(self):
+        """Clear the last validation of the Bison configuration."""
+        b = bison.Bison(scheme=bison.Scheme(
+            bison.Option('foo', field_type=str)
+        ))
+        b.set('foo', 'bar')
+        b.validate()
+        assert b._validated is not None
+
+        b.config['foo'] = 1
+        b.clear_validation()
+        assert b._validated is None
+        with pytest.raises(errors.SchemeValidationError):
+            b.validate()
+
+    def test_validate_set_clears_memo(self):
+        """Setting a value clears the last validation of the Bison configuration."""
+        b = bison.Bison(scheme=bison.Scheme(
+            bison.Option('foo', field_type=str)
+        ))
+        b.set('foo', 'bar')
+        b.validate()
+        assert b._validated is not None
+
+        b.set('foo', 'baz')
+        assert b._validated is None
+
     def test_find_config(self, yaml_config):
         """Find a config file when it does exist"""
         b = bison.Bison()
@@ -320,6 +544,45 @@ class TestBison:
 
         assert b.config_file == os.path.join(yaml_config.dirname, yaml_config.basename)
 
+    def test_find_config_missing_path(self, yaml_config):
+        """Find a config file when some search paths do not exist."""
+        b = bison.Bison()
+        b.config_paths = [
+            os.path.join(yaml_config.dirname, 'does-not-exist'),
+            str(yaml_config),  # not a directory
+            yaml_config.dirname,
+        ]
+
+        b._find_config()
+
+        assert b.config_file == os.path.join(yaml_config.dirname, yaml_config.basename)
+
+    def test_find_config_directory(self, tmpdir):
+        """A directory with the config file name is not used as the config."""
+        tmpdir.mkdir('config.yml')
+        cfg = tmpdir.join('config.yaml')
+        cfg.write('foo: bar')
+
+        b = bison.Bison()
+        b.config_paths = [str(tmpdir)]
+
+        b._find_config()
+
+        assert b.config_file == str(cfg)
+
+    def test_find_config_subdirectory(self, tmpdir):
+        """Find a config file whose name includes a subdirectory."""
+        cfg = tmpdir.mkdir('conf').join('app.yml')
+        cfg.write('foo: bar')
+
+        b = bison.Bison()
+        b.config_name = os.path.join('conf', 'app')
+        b.config_paths = [str(tmpdir)]
+
+        b._find_config()
+
+        assert b.config_file == str(cfg)
+
     def test_find_config_nonexistent(self):
         """Find a config file when it does not exist"""
         b = bison.Bison()
@@ -370,6 +633,157 @@ class TestBison:
             }
         }
 
+    def test_parse_config_loader_equivalent(self, yaml_config):
+        """The YAML loader used by Bison parses the same as the pure-Python SafeLoader."""
+        with open(str(yaml_config), 'rb') as f:
+            expected = yaml.load(f, Loader=yaml.SafeLoader)
+
+        with open(str(yaml_config), 'rb') as f:
+            actual = bison.Bison._fmt_to_parser[YAML]()(f)
+
+        assert actual == expected
+
+    def test_parse_config_cached(self, yaml_config, monkeypatch):
+        """Parsing an unchanged config file again does not re-run the parser."""
+        import bison.bison
+
+        calls = []
+        load = bison.bison._get_yaml_parser()
+        monkeypatch.setattr(bison.bison, '_yaml_load', lambda f: calls.append(f) or load(f))
+
+        b = bison.Bison()
+        b.add_config_paths(os.path.dirname(yaml_config))
+        b._parse_config()
+        assert len(calls) == 1
+
+        # modifying the parsed config does not modify the cached config
+        b._config['foo'] = 'changed'
+
+        b2 = bison.Bison()
+        b2.add_config_paths(os.path.dirname(yaml_config))
+        b2._parse_config()
+        assert len(calls) == 1
+        assert b2._config['foo'] is True
+
+        # modifying the file parses it again
+        yaml_config.write('foo: false\n')
+        b2._parse_config()
+        assert len(calls) == 2
+        assert b2._config == {'foo': False}
+
+    def test_parse_config_replaced(self, tmpdir):
+        """Parse a config file again after it is replaced by a file with the
+        same size and modification time.
+        """
+        cfg = tmpdir.join('config.yml')
+        cfg.write('foo: aaa\n')
+
+        b = bison.Bison()
+        b.add_config_paths(cfg.dirname)
+        b._parse_config()
+        assert b._config == {'foo': 'aaa'}
+
+        st = os.stat(str(cfg))
+        new = tmpdir.join('new.yml')
+        new.write('foo: bbb\n')
+        os.utime(str(new), ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(str(new), str(cfg))
+
+        b._parse_config()
+        assert b._config == {'foo': 'bbb'}
+
+    def test_parse_config_no_yaml(self, yaml_config, monkeypatch):
+        """Parse a YAML config file when the yaml module is not installed."""
+        import bison.bison
+
+        monkeypatch.setattr(bison.bison, '_yaml', None)
+        monkeypatch.setattr(bison.bison, '_yaml_load', None)
+        monkeypatch.setitem(sys.modules, 'yaml', None)
+
+        b = bison.Bison()
+        b.add_config_paths(os.path.dirname(yaml_config))
+
+        with pytest.raises(errors.BisonError, match='PyYAML is required'):
+            b._parse_config()
+
+    def test_parse_config_bom(self, tmpdir):
+        """Parse a config file which starts with a UTF-8 byte order mark."""
+        cfg = tmpdir.join('config.yml')
+        cfg.write_binary(b'\xef\xbb\xbffoo: bar\n')
+
+        b = bison.Bison()
+        b.add_config_paths(cfg.dirname)
+        b._parse_config()
+
+        assert b._config == {'foo': 'bar'}
+
+    @pytest.mark.parametrize(
+        'max_bytes,expected', [
+            # no complete entry fits in the header, so the full file is parsed
+            (10, {'name': 'app', 'version': 2, 'data': {'a': 1, 'b': 2}}),
+            (20, {'name': 'app'}),
+            (30, {'name': 'app', 'version': 2}),
+            (4096, {'name': 'app', 'version': 2, 'data': {'a': 1, 'b': 2}}),
+        ]
+    )
+    def test_peek_header(self, tmpdir, max_bytes, expected):
+        """Parse only the header of a config file."""
+        cfg = tmpdir.join('config.yml')
+        cfg.write('name: app\nversion: 2\ndata:\n  a: 1\n  b: 2\n')
+
+        b = bison.Bison()
+        assert b._peek_header(str(cfg), max_bytes=max_bytes) == expected
+
+    @pytest.mark.parametrize(
+        'content,max_bytes,expected', [
+            # a document marker is not an entry, so the only entry is too large
+            # for the header and the full file is parsed
+            ('---\ndata:\n  a: 1\n  b: 2\n', 12, {'data': {'a': 1, 'b': 2}}),
+            ('%YAML 1.1\n---\ndata:\n  a: 1\n  b: 2\n', 20, {'data': {'a': 1, 'b': 2}}),
+            ('---\nname: app\ndata:\n  a: 1\n  b: 2\n', 20, {'name': 'app'}),
+        ]
+    )
+    def test_peek_header_document_markers(self, tmpdir, content, max_bytes, expected):
+        """Parse only the header of a config file with YAML document markers."""
+        cfg = tmpdir.join('config.yml')
+        cfg.write(content)
+
+        b = bison.Bison()
+        assert b._peek_header(str(cfg), max_bytes=max_bytes) == expected
+
+    def test_parse_header_only(self, yaml_config):
+        """Parse the config file header via the parse() entrypoint."""
+        b = bison.Bison()
+        b.add_config_paths(yaml_config.dirname)
+        b.parse(parse_header_only=True)
+
+        assert b._config == {
+            'foo': True,
+            'bar': {
+                'baz': 1,
+                'test': 'value'
+            }
+        }
+
+    def test_parse_header_only_parser(self, yaml_config, monkeypatch):
+        """Parse the config file header with the parser resolved by _parse_config."""
+        calls = []
+        get_parser = bison.bison._get_yaml_parser
+        monkeypatch.setitem(bison.Bison._fmt_to_parser, YAML, lambda: calls.append(1) or get_parser())
+
+        b = bison.Bison()
+        b.add_config_paths(yaml_config.dirname)
+        b._parse_config(parse_header_only=True)
+
+        assert len(calls) == 1
+        assert b._config == {
+            'foo': True,
+            'bar': {
+                'baz': 1,
+                'test': 'value'
+            }
+        }
+
     def test_parse_config_fail(self, bad_yaml_config):
         """Parse the file config unsuccessfully."""
         b = bison.Bison()
@@ -555,6 +969,21 @@ class TestBison:
         assert len(b._environment) == 0
         assert len(b.config) == 0
 
+    def test_parse_env_no_bindings_skips_scan(self, with_env, monkeypatch):
+        """Parse the environment when no option is bound to env and auto_env is off."""
+        def fail(*args, **kwargs):
+            raise AssertionError('the environment should not be parsed')
+        monkeypatch.setattr(bison.Scheme, 'parse_env', fail)
+
+        b = bison.Bison(scheme=bison.Scheme(
+            bison.Option('foo', bind_env=False)
+        ))
+        b.env_prefix = 'TEST_ENV'
+        b._parse_env()
+
+        assert len(b._environment) == 0
+        assert b.env_prefix == 'TEST_ENV_'
+
     def test_parse_env_bind_env_false_no_prefix(self, with_env):
         """Parse the environment variable configuration."""
         b = bison.Bison(scheme=bison.Scheme(
@@ -649,6 +1078,22 @@ class TestBison:
             }
         }
 
+    def test_parse_env_prefix_changed(self, with_env):
+        """Parse the environment variable configuration after changing the prefix."""
+        b = bison.Bison(scheme=bison.Scheme(
+            bison.Option('bar', bind_env=True)
+        ))
+        b.env_prefix = 'TEST_OTHER_ENV'
+
+        b._parse_env()
+        assert b.config == {'bar': 'baz'}
+
+        b.env_prefix = 'TEST_ENV'
+        b._environment = bison.DotDict()
+        b._parse_env()
+        assert len(b._environment) == 0
+        assert b.scheme.flatten()['bar']._env_key_cache == {('TEST_ENV_', 'bar'): 'TEST_ENV_BAR'}
+
     def test_parse_env_int_value(self, with_env):
         """Parse the environment variable configuration."""
         b = bison.Bison(scheme=bison.Scheme(
@@ -1,8 +1,11 @@
 """Unit tests for bison.scheme"""
 
+import pickle
+import threading
+
 import pytest
 
-from bison import errors, scheme
+from bison import errors, scheme, utils
 
 
 def test_base_opt_validate():
@@ -19,6 +22,156 @@ def test_base_opt_parse_env():
         opt.parse_env()
 
 
+@pytest.mark.parametrize(
+    'obj', [
+        scheme.Scheme(),
+        scheme.Option('foo'),
+        scheme.DictOption('foo', scheme=None),
+        scheme.ListOption('foo'),
+    ]
+)
+def test_slots(obj):
+    """Schemes and options do not have a per-instance __dict__."""
+    assert not hasattr(obj, '__dict__')
+    with pytest.raises(AttributeError):
+        obj.not_an_attribute = 1
+
+
+@pytest.mark.parametrize(
+    'obj,ok,bad', [
+        (scheme.Option('foo'), 'bar', None),
+        (scheme.Option('foo', field_type=bool), True, 1),
+        (scheme.Option('foo', field_type=str), 'bar', 1),
+        (scheme.Option('foo', field_type=int), 1, 1.0),
+        (scheme.Option('foo', field_type=float), 1.0, 1),
+        (scheme.Option('foo', field_type=list), [1], (1,)),
+        (scheme.Option('foo', field_type=[list, dict]), {}, 'bar'),
+        (scheme.Option('foo', field_type=(list, bool)), False, 0),
+        (scheme.Option('foo', choices=['bar', 1]), 'bar', 'baz'),
+        (scheme.Option('foo', choices=('bar', 1)), 1, []),
+        (scheme.Option('foo', choices=[[1], {}]), {}, [2]),
+        (scheme.ListOption('foo'), [1, 'bar'], 'bar'),
+        (scheme.ListOption('foo', member_type=int), [1, 2], [1, 'bar']),
+        (scheme.ListOption('foo', member_scheme=scheme.Scheme(
+            scheme.Option('bar', field_type=int),
+        )), [{'bar': 1}], [{'bar': 'baz'}]),
+    ]
+)
+def test_option_pickle(obj, ok, bad):
+    """An option validates the same after a pickle round-trip."""
+    loaded = pickle.loads(pickle.dumps(obj))
+    assert loaded.default is scheme._no_default
+    loaded.validate('foo', ok)
+    if bad is not None:
+        with pytest.raises(errors.SchemeValidationError):
+            loaded.validate('foo', bad)
+
+
+@pytest.mark.parametrize(
+    'obj', [
+        scheme.ListOption('foo', member_type=int, member_scheme=scheme.Scheme()),
+        scheme.ListOption('foo', member_scheme=object()),
+    ]
+)
+def test_option_pickle_misconfigured(obj):
+    """A misconfigured list option still fails validation after a pickle
+    round-trip.
+    """
+    loaded = pickle.loads(pickle.dumps(obj))
+    with pytest.raises(errors.SchemeValidationError):
+        loaded.validate('foo', [1])
+
+
+@pytest.mark.parametrize(
+    'field_type,value,expected,bad', [
+        (str, 1, '1', None),
+        (int, '1', 1, 'bar'),
+        (float, '1.5', 1.5, 'bar'),
+    ]
+)
+def test_option_pickle_cast(field_type, value, expected, bad):
+    """An option casts the same after a pickle round-trip."""
+    opt = scheme.Option('foo', field_type=field_type)
+    loaded = pickle.loads(pickle.dumps(opt))
+    assert loaded.cast(value) == expected
+    if bad is not None:
+        with pytest.raises(errors.BisonError):
+            loaded.cast(bad)
+
+
+def test_scheme_pickle():
+    """A scheme validates the same after a pickle round-trip."""
+    sch = scheme.Scheme(
+        scheme.Option('foo', field_type=bool),
+        scheme.Option('bar', default=[], field_type=[list, tuple]),
+        scheme.Option('choice', default='a', choices=['a', 'b']),
+        scheme.ListOption('items', default=[], member_type=int),
+        scheme.DictOption('baz', scheme=scheme.Scheme(
+            scheme.Option('qux', field_type=dict),
+        )),
+    )
+    loaded = pickle.loads(pickle.dumps(sch))
+    assert loaded.build_defaults() == {'bar': [], 'choice': 'a', 'items': []}
+    loaded.validate({'foo': True, 'baz': {'qux': {}}})
+    with pytest.raises(errors.SchemeValidationError):
+        loaded.validate({'foo': 1, 'baz': {'qux': {}}})
+    with pytest.raises(errors.SchemeValidationError):
+        loaded.validate({'foo': True, 'baz': {'qux': []}})
+    with pytest.raises(errors.SchemeValidationError):
+        loaded.validate({'foo': True, 'choice': 'c', 'baz': {'qux': {}}})
+    with pytest.raises(errors.SchemeValidationError):
+        loaded.validate({'foo': True, 'items': ['a'], 'baz': {'qux': {}}})
+
+
+@pytest.mark.parametrize(
+    'value,limit,expected', [
+        ('foo', 120, 'foo'),
+        ({'a': 1}, 120, "{'a': 1}"),
+        ('a' * 10, 10, 'a' * 10),
+        ('a' * 11, 10, 'a' * 10 + '...'),
+        (list(range(100)), 5, '[0, 1...'),
+    ]
+)
+def test_short_str(value, limit, expected):
+    """Get the truncated string form of a value for an error message."""
+    assert scheme._short_str(value, limit) == expected
+
+
+def test_validate_error_truncated():
+    """Validating a large value does not put all of it in the error message."""
+    opt = scheme.Option('foo', field_type=str)
+    value = {str(i): i for i in range(10000)}
+    with pytest.raises(errors.SchemeValidationError) as e:
+        opt.validate('foo', value)
+    assert len(str(e.value)) < 300
+
+
+def test_base_opt_no_default():
+    """The base option has no default value."""
+    opt = scheme._BaseOpt()
+    assert opt.default is scheme._no_default
+
+
+@pytest.mark.parametrize(
+    'key,prefix,expected', [
+        ('foo', None, 'FOO'),
+        ('foo', '', 'FOO'),
+        ('foo', 'test_env_', 'TEST_ENV_FOO'),
+        ('nested.env.key', None, 'NESTED_ENV_KEY'),
+        ('nested.env.key', 'TEST_ENV_', 'TEST_ENV_NESTED_ENV_KEY'),
+    ]
+)
+def test_base_opt_env_key(key, prefix, expected):
+    """Get the environment variable name for an option."""
+    opt = scheme._BaseOpt()
+    assert opt._env_key(key, prefix) == expected
+    assert opt._env_key_cache == {(prefix, key): expected}
+
+    # the cached value is used on subsequent lookups
+    assert opt._env_key(key, prefix) == expected
+    assert len(opt._env_key_cache) == 1
+
+
 class TestOption:
     """Tests for the `Option` class."""
 
@@ -136,7 +289,9 @@ class TestOption:
             ([1.21, 1.22, 1.23], 1.23),
             ((1.21, 1.22, 1.23), 1.23),
             ([True, False], False),
-            ((True, False), False)
+            ((True, False), False),
+            ([[1, 2], [3]], [3]),  # choices can be unhashable
+            ({'one', 'two'}, 'one'),  # choices can be sets
         ]
     )
     def test_validate_choices_ok(self, choices, value):
@@ -150,7 +305,9 @@ class TestOption:
             ([1, 2, 3], 0),
             ([], None),
             ([0.2, 0.3, 0.4], 0.1),
-            ([False], True)
+            ([False], True),
+            (['one', 'two'], ['one']),  # unhashable value
+            ([[1, 2], [3]], [4]),
         ]
     )
     def test_validate_choices_failure(self, choices, value):
@@ -176,6 +333,9 @@ class TestOption:
             (scheme.Option('foo', field_type=bool), 'true', True),
             (scheme.Option('foo', field_type=bool), 'True', True),
             (scheme.Option('foo', field_type=bool), 'TRUE', True),
+            (scheme.Option('foo', field_type=bool), 'tRuE', True),
+            (scheme.Option('foo', field_type=bool), 'fAlSe', False),
+            (scheme.Option('foo', field_type=bool), 'yes', False),
         ]
     )
     def test_cast(self, option, value, expected):
@@ -188,6 +348,8 @@ class TestOption:
             (scheme.Option('foo', field_type=int), 'foo'),
             (scheme.Option('foo', field_type=list), 'foo'),
             (scheme.Option('foo', field_type=tuple), 'foo'),
+            (scheme.Option('foo', field_type=[str, int]), 'foo'),
+            (scheme.Option('foo', field_type=float), 'abc'),
         ]
     )
     def test_cast_fail(self, option, value):
@@ -266,6 +428,14 @@ class TestDictOption:
         assert isinstance(opt.scheme, scheme.Scheme)
         assert opt.bind_env is True
 
+    def test_init_scheme_check(self):
+        """Initialize DictOptions, precomputing the nested scheme check."""
+        assert scheme.DictOption('test-opt', scheme=None)._scheme_check is None
+
+        sch = scheme.Scheme()
+        opt = scheme.DictOption('test-opt', scheme=sch)
+        assert opt._scheme_check == sch.validate_many
+
     @pytest.mark.parametrize(
         'value', [
             'foo',
@@ -335,6 +505,31 @@ class TestDictOption:
         actual = option.parse_env(key=key, prefix=prefix, auto_env=auto_env)
         assert actual == expected
 
+    @pytest.mark.parametrize(
+        'matches', [
+            [],
+            [('A', '1')],
+            [('A_B', '1'), ('A_C', '2'), ('D', '3')],
+            [('A', '1'), ('A_B', '2')],
+            [('A_B', '2'), ('A', '1')],
+            [('A_B_C', '1'), ('A_B', '2'), ('A_D_E', '3')],
+        ]
+    )
+    def test_from_env(self, matches):
+        """Build the DictOption value from env variables, matching the result
+        of setting each of them on a DotDict.
+        """
+        expected = utils.DotDict()
+        for k, v in matches:
+            expected[k.replace('_', '.').lower()] = v
+
+        actual = scheme.DictOption._from_env(matches)
+        if not matches:
+            assert actual is None
+        else:
+            assert isinstance(actual, utils.DotDict)
+            assert actual == expected
+
 
 class TestListOption:
     """Tests for the `ListOption` class."""
@@ -366,6 +561,18 @@ class TestListOption:
         assert isinstance(opt.member_scheme, scheme.Scheme)
         assert opt.bind_env is True
 
+    def test_init_members_check(self):
+        """Initialize ListOptions, precomputing the member check."""
+        assert scheme.ListOption('test-opt')._members_check is None
+
+        sch = scheme.Scheme()
+        opt = scheme.ListOption('test-opt', member_scheme=sch)
+        assert opt._members_check == sch.validate_many
+
+        # a misconfigured option can still be created; it fails on validate
+        opt = scheme.ListOption('test-opt', member_type=dict, member_scheme=sch)
+        assert opt._members_check is not None
+
     @pytest.mark.parametrize(
         'value', [
             'foo',
@@ -623,6 +830,75 @@ class TestScheme:
 
         assert defaults == expected
 
+    def test_build_defaults_cached(self):
+        """Build a defaults dict from a Scheme multiple times."""
+        sch = scheme.Scheme(
+            scheme.Option('foo', default='bar'),
+            scheme.DictOption('bar', scheme=scheme.Scheme(
+                scheme.Option('baz', default=[1, 2])
+            ))
+        )
+        assert sch._defaults is None
+
+        defaults = sch.build_defaults()
+        assert defaults == {'foo': 'bar', 'bar': {'baz': [1, 2]}}
+        assert sch._defaults is not None
+
+        # modifying the returned defaults should not change the cached defaults
+        defaults['foo'] = 'test'
+        defaults['bar']['baz'].append(3)
+        assert sch.build_defaults() == {'foo': 'bar', 'bar': {'baz': [1, 2]}}
+
+        sch._invalidate()
+        assert sch._defaults is None
+        assert sch._flat is None
+
+    def test_build_defaults_shared_values(self):
+        """Build a defaults dict from a Scheme with defaults that can not be copied."""
+        lock = threading.Lock()
+        sch = scheme.Scheme(
+            scheme.Option('lock', default=lock),
+            scheme.Option('module', default=threading),
+            scheme.Option('items', default=[{'lock': lock}]),
+        )
+
+        defaults = sch.build_defaults()
+        assert defaults['lock'] is lock
+        assert defaults['module'] is threading
+        assert defaults['items'][0]['lock'] is lock
+
+        # the containers are still copied, so modifying them is safe
+        defaults['items'][0]['lock'] = None
+        assert sch.build_defaults()['items'] == [{'lock': lock}]
+
+    def test_build_defaults_shared_scheme(self):
+        """Build a defaults dict from a Scheme which shares a nested scheme
+        between options and has defaults which can not be copied.
+        """
+        lock = threading.Lock()
+        sub = scheme.Scheme(
+            scheme.Option('baz', default=(1, 2)),
+            scheme.Option('lock', default=lock),
+        )
+        sch = scheme.Scheme(
+            scheme.Option('foo', default='bar'),
+            scheme.DictOption('bar', scheme=sub),
+            scheme.DictOption('qux', scheme=sub),
+        )
+        expected = {
+            'foo': 'bar',
+            'bar': {'baz': (1, 2), 'lock': lock},
+            'qux': {'baz': (1, 2), 'lock': lock},
+        }
+        defaults = sch.build_defaults()
+        assert defaults == expected
+        assert defaults['bar']['lock'] is lock
+
+        # the nested dicts are copied, even where they share a cached source
+        assert defaults['bar'] is not defaults['qux']
+        defaults['bar']['baz'] = 'test'
+        assert sch.build_defaults() == expected
+
     @pytest.mark.parametrize(
         'args', [
             ('a', 'b'),  # not an instance of _BaseOpt
@@ -634,6 +910,129 @@ class TestScheme:
         with pytest.raises(errors.InvalidSchemeError):
             sch.build_defaults()
 
+    def test_compile(self):
+        """Compile the Scheme validation lookup structures."""
+        foo = scheme.Option('foo')
+        bar = scheme.Option('bar', default='baz')
+        baz = scheme.DictOption('baz', scheme=None, required=False)
+        sub = scheme.Scheme(scheme.Option('a'))
+        qux = scheme.DictOption('qux', scheme=sub)
+        sch = scheme.Scheme(foo, bar, baz, qux)
+        assert sch._compiled is None
+        assert sch._name_to_arg is None
+
+        sch._compile()
+        assert sch._compiled == (
+            ('foo', foo, False, None),
+            ('bar', bar, True, None),
+            ('baz', baz, False, None),
+            ('qux', qux, False, sub),
+        )
+        assert sch._name_to_arg == {'foo': foo, 'bar': bar, 'baz': baz, 'qux': qux}
+        assert sch._required_names == ('foo', 'qux')
+
+    def test_flatten_invalid_scheme(self):
+        """Flatten a Scheme with bad data."""
+        sch = scheme.Scheme(scheme.Option('foo'), 'b')
+        with pytest.raises(errors.InvalidSchemeError):
+            sch.flatten()
+
+    def test_parse_env(self, monkeypatch):
+        """Parse the environment for all options in a Scheme."""
+        monkeypatch.setenv('TEST_ENV_FOO', 'bar')
+        monkeypatch.setenv('TEST_ENV_NESTED_A', '1')
+        monkeypatch.setenv('TEST_ENV_NESTED_INNER_B', '2')
+        monkeypatch.setenv('TEST_ENV_LIST', 'a,b')
+
+        sch = scheme.Scheme(
+            scheme.Option('foo', bind_env=True),
+            scheme.Option('baz', bind_env=True),
+            scheme.DictOption('nested', bind_env=True, scheme=scheme.Scheme(
+                scheme.DictOption('inner', bind_env=True, scheme=None),
+            )),
+            scheme.DictOption('other', bind_env=True, scheme=None),
+            scheme.ListOption('list', bind_env=True),
+        )
+        values = sch.parse_env('TEST_ENV_')
+
+        # the values match parsing the env for each option individually
+        expected = {}
+        for k, v in sch.flatten().items():
+            value = v.parse_env(k, 'TEST_ENV_')
+            if value is not None:
+                expected[k] = value
+
+        assert values == expected
+        assert list(values) == ['foo', 'nested', 'nested.inner', 'list']
+        assert values['nested'] == {'a': '1', 'inner': {'b': '2'}}
+        assert values['nested.inner'] == {'b': '2'}
+
+    def test_parse_env_same_prefix(self, monkeypatch):
+        """Parse the environment for DictOptions which share an env prefix."""
+        monkeypatch.setenv('TEST_ENV_A_B_C', '1')
+
+        sch = scheme.Scheme(
+            scheme.DictOption('a_b', bind_env=True, scheme=None),
+            scheme.DictOption('a', bind_env=True, scheme=scheme.Scheme(
+                scheme.DictOption('b', bind_env=True, scheme=None),
+            )),
+        )
+        assert sch.parse_env('TEST_ENV_') == {
+            'a_b': {'c': '1'},
+            'a': {'b': {'c': '1'}},
+            'a.b': {'c': '1'},
+        }
+
+    @pytest.mark.parametrize(
+        'args,expected', [
+            ((), False),
+            ((scheme.Option('foo'),), False),
+            ((scheme.Option('foo', bind_env=False),), False),
+            ((scheme.Option('foo', bind_env=True),), True),
+            ((scheme.Option('foo', bind_env='FOO'),), True),
+            ((scheme.ListOption('foo', bind_env=True),), True),
+            ((scheme.DictOption('foo', scheme=None),), False),
+            ((scheme.DictOption('foo', scheme=scheme.Scheme(
+                scheme.Option('bar', bind_env=True),
+            )),), True),
+        ]
+    )
+    def test_has_env_bindings(self, args, expected):
+        """Check whether any option in a Scheme is bound to env."""
+        assert scheme.Scheme(*args).has_env_bindings() is expected
+
+    def test_parse_env_no_common_prefix(self, monkeypatch):
+        """Parse the environment for DictOptions which share no env prefix."""
+        monkeypatch.setenv('FOO_A', '1')
+        monkeypatch.setenv('BAR_B', '2')
+        monkeypatch.setenv('BAZ_C', '3')
+
+        sch = scheme.Scheme(
+            scheme.DictOption('foo', bind_env=True, scheme=None),
+            scheme.DictOption('bar', bind_env=True, scheme=None),
+        )
+        assert sch.parse_env() == {
+            'foo': {'a': '1'},
+            'bar': {'b': '2'},
+        }
+
+    @pytest.mark.parametrize(
+        'option,environ,expected', [
+            (scheme.Option('foo', bind_env=True), {'TEST_FOO': 'bar'}, 'bar'),
+            (scheme.ListOption('foo', bind_env=True), {'TEST_FOO': 'a,b'}, ['a', 'b']),
+            (scheme.DictOption('foo', bind_env=True, scheme=None), {'TEST_FOO_X': 'y'}, {'x': 'y'}),
+        ]
+    )
+    def test_parse_env_environ(self, option, environ, expected):
+        """Parse the environment for options from a given environ dict."""
+        assert option.parse_env(prefix='TEST_', environ=environ) == expected
+
+    def test_validate_invalid_scheme(self):
+        """Validate a config against a Scheme with bad data."""
+        sch = scheme.Scheme('a', 'b')
+        with pytest.raises(errors.InvalidSchemeError):
+            sch.validate({'a': 1})
+
     @pytest.mark.parametrize(
         'args,expected', [
             (
@@ -770,6 +1169,117 @@ class TestScheme:
         with pytest.raises(errors.SchemeValidationError):
             sch.validate(value)
 
+    def test_validate_many_ok(self):
+        """Validate multiple configs against a Scheme successfully."""
+        sch = scheme.Scheme(
+            scheme.Option('foo', field_type=str),
+            scheme.Option('bar', default=1, field_type=int),
+        )
+        sch.validate_many([{'foo': 'a'}, {'foo': 'b', 'bar': 2}])
+        sch.validate_many([])
+
+    @pytest.mark.parametrize(
+        'value', [
+            [{'foo': 'a'}, {'bar': 2}],
+            [{'foo': 'a'}, {'foo': 1}],
+            [{'foo': 'a'}, 'foo'],
+        ]
+    )
+    def test_validate_many_failure(self, value):
+        """Validate multiple configs against a Scheme unsuccessfully."""
+        sch = scheme.Scheme(
+            scheme.Option('foo', field_type=str),
+            scheme.Option('bar', default=1, field_type=int),
+        )
+        with pytest.raises(errors.SchemeValidationError):
+            sch.validate_many(value)
+
+    @pytest.mark.parametrize(
+        'value,message', [
+            ({'bar': 1, 'baz': 2}, 'Option "foo" is required, but not found.'),
+            ({}, 'Options "foo", "baz" are required, but not found.'),
+        ]
+    )
+    def test_validate_missing_aggregated(self, value, message):
+        """Validate a config missing required options, reporting all of them."""
+        sch = scheme.Scheme(
+            scheme.Option('foo', field_type=str),
+            scheme.Option('bar', default=1, field_type=int),
+            scheme.Option('baz'),
+        )
+        with pytest.raises(errors.SchemeValidationError) as e:
+            sch.validate(value)
+        assert str(e.value) == message
+
+    def test_validate_seen_skips_repeated(self, monkeypatch):
+        """Validate a config where the same dict is repeated, validating it once."""
+        opt = scheme.Option('bar', field_type=int)
+        sch = scheme.Scheme(
+            scheme.ListOption('foo', member_scheme=scheme.Scheme(opt)),
+        )
+        calls = []
+        validate = scheme.Option.validate
+        monkeypatch.setattr(scheme.Option, 'validate', lambda *a, **kw: calls.append(a) or validate(*a, **kw))
+
+        member = {'bar': 1}
+        sch.validate({'foo': [member, member, member]})
+        assert len(calls) == 1
+
+        # the memo is scoped to a single validation pass
+        sch.validate({'foo': [member]})
+        assert len(calls) == 2
+
+    @pytest.mark.parametrize(
+        'config,message', [
+            ({'a': {'b': 1}, 'c': 1}, None),
+            ({'a': {'b': 1}}, None),
+            ({'a': {'b': 'x'}, 'c': 1}, 'a.b=x : value is of type <class \'str\'>, but should be <class \'int\'>'),
+            ({'c': 1}, 'Option "a.b" is required, but not found.'),
+            ({'a': {'c': 1}}, 'Option "a.b" is required, but not found.'),
+        ]
+    )
+    def test_validate_dotted_names(self, config, message):
+        """Validate a DotDict config against a Scheme with dotted option names."""
+        sch = scheme.Scheme(
+            scheme.Option('a.b', field_type=int),
+            scheme.Option('c', required=False),
+        )
+        sch._compile()
+        assert sch._dotted_names is True
+
+        if message is None:
+            sch.validate(utils.DotDict(config))
+        else:
+            with pytest.raises(errors.SchemeValidationError) as e:
+                sch.validate(utils.DotDict(config))
+            assert str(e.value) == message
+
+    def test_validate_seen_freed_configs(self):
+        """Validate configs which are freed during the validation pass, so
+        their ids may be reused by later configs.
+        """
+        sch = scheme.Scheme(scheme.Option('foo', field_type=int))
+
+        def configs():
+            for i in range(6):
+                yield {'foo': i}
+            yield {'foo': 'bad'}
+
+        with pytest.raises(errors.SchemeValidationError):
+            sch.validate_many(configs())
+
+    def test_validate_seen_distinct_schemes(self):
+        """Validate a config where the same dict is checked against different
+        schemes, validating it against each of them.
+        """
+        shared = {'bar': 'a'}
+        sch = scheme.Scheme(
+            scheme.DictOption('foo', scheme=scheme.Scheme(scheme.Option('bar', field_type=str))),
+            scheme.DictOption('baz', scheme=scheme.Scheme(scheme.Option('bar', field_type=int))),
+        )
+        with pytest.raises(errors.SchemeValidationError):
+            sch.validate({'foo': shared, 'baz': shared})
+
     @pytest.mark.parametrize(
         'args,value', [
             (
@@ -1,5 +1,8 @@
 """Unit tests for bison.utils"""
 
+import copy
+import sys
+
 import pytest
 
 from bison import utils
@@ -20,6 +23,38 @@ def test_build_dot_value(key, value, expected):
     assert res == expected
 
 
+@pytest.mark.parametrize(
+    'parts,value,expected', [
+        (['a'],           'b',  ('a', 'b')),
+        (['a', 'b'],      'c',  ('a', {'b': 'c'})),
+        (['a', 'b', 'c'], None, ('a', {'b': {'c': None}})),
+        (['a', 'a', 'a'], 1,    ('a', {'a': {'a': 1}})),
+    ]
+)
+def test_build_dot_value_from_parts(parts, value, expected):
+    """Test building new dictionaries based off of split key components"""
+    res = utils.build_dot_value_from_parts(parts, value)
+    assert res == expected
+
+
+@pytest.mark.parametrize(
+    'key,expected', [
+        ('a', ('a',)),
+        ('a.b', ('a', 'b')),
+        ('a.b.c', ('a', 'b', 'c')),
+        ('', ('',)),
+    ]
+)
+def test_split_key(key, expected):
+    """Test splitting a dot notation key into its components"""
+    assert utils._split_key(key) == expected
+
+    # the split is memoized
+    hits = utils._split_key.cache_info().hits
+    assert utils._split_key(key) == expected
+    assert utils._split_key.cache_info().hits == hits + 1
+
+
 class TestDotDict:
     """Tests for the DotDict class."""
 
@@ -36,6 +71,18 @@ class TestDotDict:
         dd = utils.DotDict(param)
         assert dd == expected
 
+    def test_slots(self):
+        """A DotDict does not have a per-instance __dict__."""
+        dd = utils.DotDict({'a': {'b': 1}})
+        assert not hasattr(dd, '__dict__')
+        with pytest.raises(AttributeError):
+            dd.not_an_attribute = 1
+
+        # it can still be copied like any other dict
+        cp = copy.deepcopy(dd)
+        assert type(cp) == utils.DotDict
+        assert cp == dd
+
     @pytest.mark.parametrize(
         'key,expected', [
             ('z', None),
@@ -103,6 +150,26 @@ class TestDotDict:
         value = dd.get(key)
         assert value is None
 
+    @pytest.mark.parametrize(
+        'key,expected', [
+            ('a.a', {'a': {'b': {'a': 2}}}),
+            ('a.b.a', {'a': {'a': 1, 'b': {}}}),
+        ]
+    )
+    def test_delete_repeated_component(self, key, expected):
+        """Delete values whose key repeats a component name."""
+        dd = utils.DotDict({
+            'a': {
+                'a': 1,
+                'b': {
+                    'a': 2
+                }
+            }
+        })
+
+        dd.delete(key)
+        assert dd == expected
+
     @pytest.mark.parametrize(
         'key', [
             'a',
@@ -139,7 +206,9 @@ class TestDotDict:
             '',
             'c.e',
             'c.d.e',
-            'c.d.e.f'
+            'c.d.e.f',
+            'a.b',
+            'b.c',
         ]
     )
     def test_delete_3(self, key):
@@ -181,6 +250,30 @@ class TestDotDict:
         with pytest.raises(KeyError):
             del dd[key]
 
+    @pytest.mark.parametrize('key', ['a.b', 'c.f.g', 'c.d.e.h'])
+    def test_get_through_non_dict(self, key):
+        """Get a key whose path goes through a non-dict value."""
+        dd = utils.DotDict({
+            'a': 1,
+            'c': {
+                'd': {
+                    'e': 'foo'
+                },
+                'f': 'bar'
+            },
+        })
+        assert dd.get(key) is None
+        assert dd.get(key, 'default') == 'default'
+
+    def test_set_nested_in_place(self):
+        """Set a nested item, modifying the nested dict in place."""
+        nested = {'c': True}
+        dd = utils.DotDict({'a': 1, 'b': nested})
+
+        dd['b.d.e'] = 'foo'
+        assert dd['b'] is nested
+        assert nested == {'c': True, 'd': {'e': 'foo'}}
+
     @pytest.mark.parametrize(
         'key,value', [
             ('a', 'foo'),
@@ -392,6 +485,24 @@ class TestDotDict:
         })
         assert (key in dd) is expected
 
+    @pytest.mark.parametrize(
+        'key,expected', [
+            ('a', True),
+            ('a.b', False),
+            ('b.c', True),
+            ('b.c.d', False),
+        ]
+    )
+    def test_inclusion_none_value(self, key, expected):
+        """Check if a key whose value is None exists in a DotDict"""
+        dd = utils.DotDict({
+            'a': None,
+            'b': {
+                'c': None
+            }
+        })
+        assert (key in dd) is expected
+
     @pytest.mark.parametrize(
         'source,expected', [
             ({}, {'foo': 'bar', 'bar': {'baz': {'key': 'value'}}}),
@@ -451,6 +562,8 @@ class TestDotDict:
             ({'test': None}, {'foo': 'bar', 'test': None, 'bar': {'baz': {'key': 'value'}}}),
             ({'foo': None}, {'foo': None, 'bar': {'baz': {'key': 'value'}}}),
             ({'bar': None}, {'foo': 'bar', 'bar': None}),
+            ({'foo': {'a': {'b': 1}}}, {'foo': {'a': {'b': 1}}, 'bar': {'baz': {'key': 'value'}}}),
+            ({'foo': {}}, {'foo': 'bar', 'bar': {'baz': {'key': 'value'}}}),
         ]
     )
     def test_merge(self, source, expected):
@@ -466,6 +579,35 @@ class TestDotDict:
         dd.merge(source)
         assert dd == expected
 
+    def test_merge_deeply_nested(self):
+        """Merge dicts nested deeper than the recursion limit."""
+        depth = sys.getrecursionlimit() + 100
+
+        source = value = {}
+        for _ in range(depth):
+            value['a'] = {}
+            value = value['a']
+        value['b'] = 1
+
+        dd = utils.DotDict()
+        dd.merge(source)
+        assert dd.get('.'.join(['a'] * depth + ['b'])) == 1
+
+        # the merged dicts are not shared with the source
+        assert dd['a'] is not source['a']
+
+    def test_merge_new_nested(self):
+        """Merge nested dicts into keys which do not exist yet."""
+        source = {'foo': {'a': 1, 'b.c': 2, 'd': {'e': [3]}}}
+
+        dd = utils.DotDict({'bar': 1})
+        dd.merge(source)
+        assert dd == {'bar': 1, 'foo': {'a': 1, 'b.c': 2, 'd': {'e': [3]}}}
+
+        # the nested dicts are copied rather than shared with the source
+        assert dd['foo'] is not source['foo']
+        assert dd['foo']['d'] is not source['foo']['d']
+
     def test_deep_merge(self):
         """Test merging through many nested dicts."""
         dd = utils.DotDict({